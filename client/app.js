@@ -49,7 +49,9 @@ const STATE = {
     },
     lastError: null,
     isInferencing: false,
-    silenceTimer: null
+    silenceTimer: null,
+    ttsSources: [],     // Scheduled TTS buffers, stopped on barge-in
+    discardTts: false   // Drop TTS still in flight from an interrupted run
 };
 
 // DOM Elements
@@ -402,6 +404,7 @@ function handleControlMessage(message) {
         case 'config_audio':
             if (message.rate) {
                 STATE.currentTtsRate = message.rate;
+                STATE.discardTts = false; // A new TTS stream starts
                 // Reset audio scheduling for new stream
                 if (STATE.audioContext) STATE.nextAudioTime = STATE.audioContext.currentTime + 0.1;
             }
@@ -431,6 +434,13 @@ function handleControlMessage(message) {
         case 'voice_event':
              handleVoiceEvent(message);
              break;
+        case 'voice_partial':
+             // Streaming STT/intent/TTS text of our run, replaced as it grows
+             if (message.text) showBubble(message.stage === 'stt' ? `"${message.text}…"` : message.text);
+             break;
+        case 'tts_first_audio':
+             log(`Answer started ${message.ms}ms after wake word`, 'info');
+             break;
         case 'ha_status':
              if (typeof message.connected !== 'undefined') {
                  const status = message.connected ? 'active' : 'disconnected';
@@ -438,6 +448,18 @@ function handleControlMessage(message) {
                  updateStatus('ha-status', status, label);
              }
              break;
+        case 'audio_quality':
+             // Server-side mic health (silent or clipping uplink)
+             if (message.state === 'silent') {
+                 log('Microphone appears silent', 'warning');
+                 if (window.showToast) window.showToast('Microphone seems silent. Check input device.', 'warning', 5000);
+             } else if (message.state === 'clipping') {
+                 log('Microphone is clipping', 'warning');
+                 if (window.showToast) window.showToast('Microphone is clipping. Lower input gain.', 'warning', 5000);
+             } else {
+                 log('Microphone level OK', 'info');
+             }
+             break;
     }
 }
 
@@ -463,6 +485,8 @@ function handleVoiceEvent(message) {
         }
         if (STATE.silenceTimer) clearTimeout(STATE.silenceTimer);
         
+    } else if (eventType === 6) { // INTENT_END
+        if (data.text) showBubble(data.text);
     } else if (eventType === 7) { // TTS_START
         if (data.text) showBubble(data.text);
     } else if (eventType === 2) { // RUN_END
@@ -664,10 +688,8 @@ function triggerWakeWord() {
         
         updateUI();
         
-        // Reset audio scheduling
-        if (STATE.audioContext) {
-            STATE.nextAudioTime = STATE.audioContext.currentTime;
-        }
+        // Barge-in: silence the previous answer and ignore the rest of it
+        stopTtsPlayback();
 
         // Notify server
         if (STATE.ws && STATE.ws.readyState === WebSocket.OPEN) {
@@ -732,10 +754,26 @@ async function loadWakeWordModel() {
     }
 }
 
+/**
+ * Stop all scheduled TTS audio and discard chunks until the next stream
+ */
+function stopTtsPlayback() {
+    if (STATE.ttsSources.length) log('Barge-in: TTS playback stopped', 'info');
+    for (const source of STATE.ttsSources) {
+        try { source.stop(); } catch (e) { /* already ended */ }
+    }
+    STATE.ttsSources = [];
+    STATE.discardTts = true;
+    if (STATE.audioContext) {
+        STATE.nextAudioTime = STATE.audioContext.currentTime;
+    }
+}
+
 /**
  * Play audio response from server (Raw PCM)
  */
 async function playAudioResponse(arrayBuffer) {
+    if (STATE.discardTts) return;
     if (!STATE.audioContext) {
         if (STATE.isActive) {
              console.warn('AudioContext lost but state is active. Re-initializing...');
@@ -776,6 +814,10 @@ async function playAudioResponse(arrayBuffer) {
         
         source.start(STATE.nextAudioTime);
         STATE.nextAudioTime += buffer.duration;
+        STATE.ttsSources.push(source);
+        source.onended = () => {
+            STATE.ttsSources = STATE.ttsSources.filter(s => s !== source);
+        };
         
     } catch (error) {
         log(`Failed to play audio: ${error.message}`, 'error');
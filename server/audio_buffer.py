@@ -1,9 +1,7 @@
 """
-Audio buffer module for managing audio chunks with async queue.
+Audio buffer module for bounded, preallocated audio storage.
 """
-import asyncio
-from collections import deque
-from typing import Optional
+from typing import Iterator
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,69 +9,62 @@ logger = logging.getLogger(__name__)
 
 class AudioBuffer:
     """
-    Manages audio buffering with async queue for non-blocking I/O.
-    Handles chunking audio data for optimal streaming performance.
+    Fixed-capacity audio store backed by a bytearray allocated once.
+    Never grows: data beyond capacity is rejected and counted, so a single
+    stream can't make us buffer more than its budget.
     """
-    
-    def __init__(self, sample_rate: int = 16000, chunk_duration_ms: int = 30):
+
+    def __init__(self, sample_rate: int = 16000, chunk_duration_ms: int = 30,
+                 capacity: int = 320000):
         """
         Initialize audio buffer.
-        
+
         Args:
             sample_rate: Audio sample rate in Hz (default 16000)
             chunk_duration_ms: Chunk duration in milliseconds (default 30)
+            capacity: Maximum bytes held
         """
         self.sample_rate = sample_rate
         self.chunk_duration_ms = chunk_duration_ms
         # Calculate chunk size in bytes (16-bit audio = 2 bytes per sample)
         self.chunk_size = int(sample_rate * chunk_duration_ms / 1000) * 2
-        self.buffer = deque()
-        self.queue = asyncio.Queue()
-        logger.info(
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.length = 0
+        self.dropped_bytes = 0
+        logger.debug(
             f"AudioBuffer initialized: {sample_rate}Hz, "
-            f"{chunk_duration_ms}ms chunks, {self.chunk_size} bytes per chunk"
+            f"{chunk_duration_ms}ms chunks, {self.capacity} bytes capacity"
         )
-    
-    def add(self, audio_data: bytes):
-        """
-        Add audio chunk to buffer and create properly sized chunks.
-        
-        Args:
-            audio_data: Raw audio bytes (16-bit PCM)
-        """
-        self.buffer.extend(audio_data)
-        
-        # Create chunks of appropriate size
-        while len(self.buffer) >= self.chunk_size:
-            chunk = bytes([self.buffer.popleft() for _ in range(self.chunk_size)])
-            self.queue.put_nowait(chunk)
-    
-    async def get_chunk(self) -> bytes:
+
+    def add(self, audio_data: bytes) -> bool:
         """
-        Get next audio chunk from queue (blocks if empty).
-        
+        Append raw audio (16-bit PCM).
+
         Returns:
-            Audio chunk as bytes
+            False if the data did not fit and was dropped
         """
-        return await self.queue.get()
-    
+        end = self.length + len(audio_data)
+        if end > self.capacity:
+            self.dropped_bytes += len(audio_data)
+            return False
+        self.buffer[self.length:end] = audio_data
+        self.length = end
+        return True
+
+    def chunks(self) -> Iterator[bytes]:
+        """Yield the buffered audio in chunk_size pieces."""
+        view = memoryview(self.buffer)
+        for start in range(0, self.length, self.chunk_size):
+            yield bytes(view[start:min(start + self.chunk_size, self.length)])
+
     def clear(self):
-        """Clear all buffered audio data."""
-        self.buffer.clear()
-        # Clear queue
-        while not self.queue.empty():
-            try:
-                self.queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
+        """Forget all buffered audio data (storage is kept)."""
+        self.length = 0
+        self.dropped_bytes = 0
         logger.debug("Audio buffer cleared")
-    
+
     @property
     def buffered_bytes(self) -> int:
         """Get number of bytes currently buffered."""
-        return len(self.buffer)
-    
-    @property
-    def queued_chunks(self) -> int:
-        """Get number of chunks in queue."""
-        return self.queue.qsize()
+        return self.length
@@ -0,0 +1,191 @@
+"""
+Streaming audio quality telemetry for the browser uplink.
+Computes block-wise RMS, peak, clipping and silence per client session
+and flags dead or clipping microphones.
+"""
+from typing import Iterable, Optional
+
+import numpy as np
+
+# 16-bit PCM amplitude thresholds. SILENCE_RMS matches analyze_wav.py's
+# silence check; CLIP_LEVEL (~-0.2 dBFS) is our own, analyze_wav.py has none.
+SILENCE_RMS = 100
+CLIP_LEVEL = 32000
+
+# Fixed-size histograms: 6 dB bins from -96 dBFS to 0 dBFS
+HIST_BINS = 16
+HIST_DB_STEP = 6.0
+
+STATE_OK = 'ok'
+STATE_SILENT = 'silent'
+STATE_CLIPPING = 'clipping'
+
+
+# Linear amplitude where each bin above the first starts (no log10 per block)
+_BIN_EDGES = 32768.0 * 10.0 ** ((np.arange(1, HIST_BINS) * HIST_DB_STEP - HIST_BINS * HIST_DB_STEP) / 20.0)
+
+
+def _db_bins(values: np.ndarray) -> np.ndarray:
+    """Map linear 16-bit amplitudes to histogram bin indices."""
+    return np.searchsorted(_BIN_EDGES, values, side='right')
+
+
+class SessionAudioStats:
+    """Per-client running audio statistics with fixed-size histograms."""
+
+    __slots__ = (
+        'blocks', 'samples', 'silent_blocks', 'clipped_samples', 'peak',
+        'rms_hist', 'peak_hist',
+        'window_blocks', 'window_silent', 'window_samples', 'window_clipped',
+        'state', 'carry', 'carry_len',
+    )
+
+    def __init__(self, block_samples: int = 512):
+        self.rms_hist = np.zeros(HIST_BINS, dtype=np.int64)
+        self.peak_hist = np.zeros(HIST_BINS, dtype=np.int64)
+        self.carry = np.zeros(block_samples, dtype=np.int16)  # Partial block left by the last frame
+        self.reset()
+
+    def reset(self):
+        """Zero all counters in place (sessions are pooled and reused)."""
+        self.blocks = 0
+        self.samples = 0
+        self.silent_blocks = 0
+        self.clipped_samples = 0
+        self.peak = 0
+        self.rms_hist.fill(0)
+        self.peak_hist.fill(0)
+        self.window_blocks = 0
+        self.window_silent = 0
+        self.window_samples = 0
+        self.window_clipped = 0
+        self.state = STATE_OK
+        self.carry_len = 0
+
+    def snapshot(self) -> dict:
+        return {
+            'state': self.state,
+            'blocks': self.blocks,
+            'silence_ratio': round(self.silent_blocks / self.blocks, 3) if self.blocks else 0.0,
+            'clipping_ratio': round(self.clipped_samples / self.samples, 4) if self.samples else 0.0,
+            'peak': self.peak,
+            'rms_hist': self.rms_hist.tolist(),
+            'peak_hist': self.peak_hist.tolist(),
+        }
+
+
+class AudioTelemetry:
+    """
+    Low-overhead uplink analyzer shared by all WebSocket clients.
+    Each frame costs one vectorized pass over at most max_frame_samples samples.
+    """
+
+    def __init__(self, block_samples: int = 512, window_blocks: int = 94,
+                 silence_ratio: float = 0.95, clipping_ratio: float = 0.01,
+                 max_frame_samples: int = 8192):
+        """
+        Initialize telemetry.
+
+        Args:
+            block_samples: Samples per analysis block (512 = 32ms at 16kHz)
+            window_blocks: Blocks per evaluation window (94 x 32ms = ~3s of audio at the defaults)
+            silence_ratio: Fraction of silent blocks in a window that flags a dead mic
+            clipping_ratio: Fraction of clipped samples in a window that flags clipping
+            max_frame_samples: Upper bound of samples analyzed per frame (excess is skipped)
+
+        Frames need not be a multiple of block_samples (the client sends 1280
+        samples): the trailing partial block is carried into the next frame.
+        """
+        self.block_samples = block_samples
+        self.window_blocks = window_blocks
+        self.silence_ratio = silence_ratio
+        self.clipping_ratio = clipping_ratio
+        self.max_frame_samples = max_frame_samples - max_frame_samples % block_samples
+
+    def new_stats(self) -> SessionAudioStats:
+        """Per-session stats object (owned by the client session)."""
+        return SessionAudioStats(self.block_samples)
+
+    def observe(self, stats: SessionAudioStats, frame: bytes) -> Optional[dict]:
+        """
+        Analyze one uplink frame (16-bit mono PCM) into a session's stats.
+        Returns an 'audio_quality' status message when the session state changes.
+        """
+        block = self.block_samples
+        samples = np.frombuffer(frame, dtype=np.int16, count=min(len(frame) // 2, self.max_frame_samples))
+
+        # Complete the block carried over from the previous frame
+        carried = stats.carry_len
+        if carried:
+            fill = min(block - carried, len(samples))
+            stats.carry[carried:carried + fill] = samples[:fill]
+            carried += fill
+            samples = samples[fill:]
+
+        n_blocks = len(samples) // block
+        body = samples[:n_blocks * block]
+        rest = samples[n_blocks * block:]
+        if carried == block:
+            body = np.concatenate((stats.carry, body))
+            n_blocks += 1
+            carried = 0
+        stats.carry[carried:carried + len(rest)] = rest
+        stats.carry_len = carried + len(rest)
+        if n_blocks == 0:
+            return None
+        blocks = body.reshape(n_blocks, block)
+
+        wide = blocks.astype(np.float32)
+        rms = np.sqrt(np.einsum('ij,ij->i', wide, wide) / blocks.shape[1])
+        magnitude = np.abs(wide)
+        peaks = magnitude.max(axis=1)
+        frame_peak = int(peaks.max())
+        clipped = int(np.count_nonzero(magnitude >= CLIP_LEVEL)) if frame_peak >= CLIP_LEVEL else 0
+        silent = int(np.count_nonzero(rms < SILENCE_RMS))
+        analyzed = blocks.size
+
+        stats.blocks += n_blocks
+        stats.samples += analyzed
+        stats.silent_blocks += silent
+        stats.clipped_samples += clipped
+        stats.peak = max(stats.peak, frame_peak)
+        stats.rms_hist += np.bincount(_db_bins(rms), minlength=HIST_BINS)
+        stats.peak_hist += np.bincount(_db_bins(peaks), minlength=HIST_BINS)
+
+        stats.window_blocks += n_blocks
+        stats.window_silent += silent
+        stats.window_samples += analyzed
+        stats.window_clipped += clipped
+        if stats.window_blocks < self.window_blocks:
+            return None
+        return self._evaluate_window(stats)
+
+    def _evaluate_window(self, stats: SessionAudioStats) -> Optional[dict]:
+        silence = stats.window_silent / stats.window_blocks
+        clipping = stats.window_clipped / stats.window_samples
+        stats.window_blocks = stats.window_silent = stats.window_samples = stats.window_clipped = 0
+
+        if silence >= self.silence_ratio:
+            state = STATE_SILENT
+        elif clipping >= self.clipping_ratio:
+            state = STATE_CLIPPING
+        else:
+            state = STATE_OK
+
+        if state == stats.state:
+            return None
+        stats.state = state
+        return {
+            'type': 'audio_quality',
+            'state': state,
+            'silence_ratio': round(silence, 3),
+            'clipping_ratio': round(clipping, 4),
+        }
+
+    @staticmethod
+    def summary(all_stats: Iterable[SessionAudioStats]) -> dict:
+        """Fleet-wide counts per state, for the status response."""
+        counts = {STATE_OK: 0, STATE_SILENT: 0, STATE_CLIPPING: 0}
+        for stats in all_stats:
+            counts[stats.state] += 1
+        return counts
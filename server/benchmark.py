@@ -0,0 +1,300 @@
+"""
+Micro-benchmarks for the server hot paths.
+Usage: python benchmark.py [name ...]   (default: all)
+"""
+import asyncio
+import sys
+import time
+
+import numpy as np
+
+
+def bench_audio_telemetry(frames: int = 20000):
+    """Per-frame cost of the uplink audio analyzer (1280-sample client frames, 80ms at 16kHz)."""
+    from audio_telemetry import AudioTelemetry
+
+    telemetry = AudioTelemetry()
+    stats = telemetry.new_stats()
+    rng = np.random.default_rng(0)
+    frame = rng.integers(-3000, 3000, 1280, dtype=np.int16).tobytes()
+    telemetry.observe(stats, frame)  # Warm-up
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        telemetry.observe(stats, frame)
+    per_frame_us = (time.perf_counter() - started) / frames * 1e6
+    budget_us = 80_000  # Real-time duration of one frame
+    print(f"audio_telemetry: {per_frame_us:.1f} us/frame "
+          f"({per_frame_us / budget_us * 100:.3f}% of real time per client)")
+
+
+async def _fake_home_assistant(satellite_port: int, uris: dict, expected_chunks: int):
+    """
+    Stand-in HA: connects to our WyomingServer like the HA integration does and
+    relays the run through the stand-in services, one fresh connection per stage.
+    """
+    from wyoming.asr import Transcribe, Transcript
+    from wyoming.audio import AudioStart, AudioStop
+    from wyoming.client import AsyncClient
+    from wyoming.handle import Handled
+    from wyoming.tts import Synthesize
+
+    async with AsyncClient.from_uri(f"tcp://127.0.0.1:{satellite_port}") as satellite:
+        while True:
+            event = await satellite.read_event()
+            if event is None:
+                return
+            if not AudioStart.is_type(event.type):
+                continue
+
+            async with AsyncClient.from_uri(uris['stt']) as stt:
+                await stt.write_event(Transcribe().event())
+                await stt.write_event(event)
+                for _ in range(expected_chunks):
+                    await stt.write_event(await satellite.read_event())
+                await stt.write_event(AudioStop().event())  # HA-side VAD decision
+                while not Transcript.is_type((transcript := await stt.read_event()).type):
+                    pass
+            await satellite.write_event(transcript)
+
+            async with AsyncClient.from_uri(uris['intent']) as intent:
+                await intent.write_event(transcript)
+                handled = Handled.from_event(await intent.read_event())
+            await satellite.write_event(Synthesize(text=handled.text).event())
+
+            async with AsyncClient.from_uri(uris['tts']) as tts:
+                await tts.write_event(Synthesize(text=handled.text).event())
+                while True:
+                    tts_event = await tts.read_event()
+                    await satellite.write_event(tts_event)
+                    if AudioStop.is_type(tts_event.type):
+                        break
+
+
+def bench_direct_vs_ha(runs: int = 20, chunks: int = 20):
+    """End of speech -> first TTS audio byte, direct pipeline vs. the HA round trip."""
+    import socket
+    import statistics
+
+    from direct_pipeline import DirectPipeline
+    from wyoming_server import WyomingServer
+    from wyoming_standins import StandinIntent, StandinSTT, StandinTTS, start_standin
+
+    speech = np.full(1024, 3000, dtype=np.int16).tobytes()
+
+    async def measure(pipeline, finish) -> list:
+        first_audio = asyncio.Event()
+
+        async def callback(message, is_binary=False, run_only=False):
+            if is_binary:
+                first_audio.set()
+
+        pipeline.set_event_callback(callback)
+        latencies = []
+        for _ in range(runs):
+            first_audio.clear()
+            await pipeline.trigger_wake_word("bench")
+            for _ in range(chunks):
+                await pipeline.send_audio(speech)
+            ended = time.perf_counter()
+            await finish()
+            await asyncio.wait_for(first_audio.wait(), timeout=5)
+            latencies.append((time.perf_counter() - ended) * 1000)
+            await asyncio.sleep(0.05)  # Let the run drain
+        return latencies
+
+    async def run():
+        servers, uris = [], {}
+        for name, cls in (('stt', StandinSTT), ('intent', StandinIntent), ('tts', StandinTTS)):
+            server, uris[name] = await start_standin(cls)
+            servers.append(server)
+
+        direct = DirectPipeline(uris['stt'], uris['tts'], intent_uri=uris['intent'])
+        await direct.warm_up()
+        direct_ms = await measure(direct, direct.finish_audio)
+        await direct.stop()
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        satellite = WyomingServer("127.0.0.1", port)
+        satellite_task = asyncio.create_task(satellite.start())
+        await asyncio.sleep(0.1)
+        ha_task = asyncio.create_task(_fake_home_assistant(port, uris, chunks))
+        while not satellite.handlers:
+            await asyncio.sleep(0.01)
+
+        async def no_finish():
+            pass  # HA decides end of speech itself
+
+        ha_ms = await measure(satellite, no_finish)
+        ha_task.cancel()
+        satellite_task.cancel()
+        await satellite.stop()
+        for server in servers:
+            await server.stop()
+        return direct_ms, ha_ms
+
+    direct_ms, ha_ms = asyncio.run(run())
+    print(f"direct_pipeline: end of speech -> first TTS audio "
+          f"median {statistics.median(direct_ms):.2f}ms (min {min(direct_ms):.2f})")
+    print(f"ha_round_trip:   end of speech -> first TTS audio "
+          f"median {statistics.median(ha_ms):.2f}ms (min {min(ha_ms):.2f})")
+
+
+async def _streaming_home_assistant(satellite_port: int, listening: asyncio.Queue, chunk_interval: float):
+    """
+    Stand-in HA that answers every run with an endless TTS stream, stopping
+    only when the satellite acknowledges it with 'played'. Puts the arrival
+    time of each run's AudioStart on the listening queue.
+    """
+    from wyoming.audio import AudioChunk, AudioStart, AudioStop
+    from wyoming.client import AsyncClient
+
+    async def speak(satellite, played: asyncio.Event):
+        await satellite.write_event(AudioStart(rate=22050, width=2, channels=1).event())
+        while not played.is_set():
+            await satellite.write_event(AudioChunk(rate=22050, width=2, channels=1, audio=bytes(2048)).event())
+            await asyncio.sleep(chunk_interval)
+        await satellite.write_event(AudioStop().event())
+
+    async with AsyncClient.from_uri(f"tcp://127.0.0.1:{satellite_port}") as satellite:
+        played = asyncio.Event()
+        while True:
+            event = await satellite.read_event()
+            if event is None:
+                return
+            if event.type == "played":
+                played.set()
+            elif AudioStart.is_type(event.type):
+                listening.put_nowait(time.perf_counter())
+                played = asyncio.Event()
+                asyncio.create_task(speak(satellite, played))
+
+
+def bench_barge_in(runs: int = 50):
+    """Wake word during TTS playback -> new run listening at HA, and stale TTS sent afterwards."""
+    import json
+    import socket
+    import statistics
+
+    from websocket_server import WebSocketServer
+    from wyoming_server import WyomingServer
+
+    class BrowserSocket:
+        remote_address = ("127.0.0.1", 1)
+
+        def __init__(self):
+            self.audio = asyncio.Event()
+            self.stale_bytes = 0
+            self.barged = False
+
+        async def send(self, message):
+            if isinstance(message, bytes):
+                self.audio.set()
+                if self.barged:
+                    self.stale_bytes += len(message)
+
+        async def close(self, code=1000, reason=''):
+            pass
+
+    async def run():
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        satellite = WyomingServer("127.0.0.1", port)
+        satellite_task = asyncio.create_task(satellite.start())
+        await asyncio.sleep(0.1)
+        listening = asyncio.Queue()
+        ha_task = asyncio.create_task(_streaming_home_assistant(port, listening, chunk_interval=0.005))
+        while not satellite.handlers:
+            await asyncio.sleep(0.01)
+
+        ws_server = WebSocketServer('127.0.0.1', 0)
+        ws_server.wyoming_ref = satellite
+        browser = BrowserSocket()
+        session = ws_server.sessions.open(browser)
+
+        async def bridge(message, is_binary=False, run_only=False):
+            await ws_server.broadcast(message)
+
+        satellite.set_event_callback(bridge)
+        wake = json.dumps({'type': 'wake_detected', 'wake_word': 'bench'})
+
+        await ws_server.handle_control_message(wake, session)
+        await listening.get()
+        latencies, stale = [], []
+        for _ in range(runs):
+            browser.audio.clear()
+            await asyncio.wait_for(browser.audio.wait(), timeout=5)
+            await asyncio.sleep(0.02)  # Mid-playback
+            browser.barged, browser.stale_bytes = True, 0
+            started = time.perf_counter()
+            await ws_server.handle_control_message(wake, session)
+            latencies.append((await listening.get() - started) * 1000)
+            browser.barged = False
+            stale.append(browser.stale_bytes)
+
+        await ws_server.sessions.close(browser)
+        ha_task.cancel()
+        satellite_task.cancel()
+        await satellite.stop()
+        return latencies, stale
+
+    latencies, stale = asyncio.run(run())
+    print(f"barge_in: wake during TTS -> listening at HA "
+          f"median {statistics.median(latencies):.2f}ms (max {max(latencies):.2f}), "
+          f"stale TTS delivered after wake: max {max(stale)} bytes")
+
+
+def bench_first_partial(runs: int = 20, chunks: int = 24, frame_interval: float = 0.01):
+    """Wake -> first partial transcript vs. wake -> final transcript, with a streaming STT."""
+    import statistics
+
+    from direct_pipeline import DirectPipeline
+    from wyoming_standins import StandinIntent, StandinSTT, StandinTTS, start_standin
+
+    speech = np.full(1024, 3000, dtype=np.int16).tobytes()
+
+    async def run():
+        servers, uris = [], {}
+        for name, cls, kwargs in (('stt', StandinSTT, {'chunks_per_word': 4, 'delay': 0.05}),
+                                  ('intent', StandinIntent, {}), ('tts', StandinTTS, {})):
+            server, uris[name] = await start_standin(cls, **kwargs)
+            servers.append(server)
+
+        pipeline = DirectPipeline(uris['stt'], uris['tts'], intent_uri=uris['intent'])
+        await pipeline.warm_up()
+        first_partial, final = [], []
+        for _ in range(runs):
+            await pipeline.trigger_wake_word("bench")
+            for _ in range(chunks):
+                await pipeline.send_audio(speech)
+                await asyncio.sleep(frame_interval)  # Real-time-ish uplink
+            await pipeline.finish_audio()
+            await asyncio.wait_for(pipeline._run_task, timeout=5)
+            t = pipeline.last_timings
+            first_partial.append((t['first_partial'] - t['wake']) * 1000)
+            final.append((t['transcript'] - t['wake']) * 1000)
+
+        await pipeline.stop()
+        for server in servers:
+            await server.stop()
+        return first_partial, final
+
+    first_partial, final = asyncio.run(run())
+    print(f"first_partial: wake -> first partial transcript median {statistics.median(first_partial):.1f}ms, "
+          f"wake -> final transcript median {statistics.median(final):.1f}ms")
+
+
+BENCHMARKS = {
+    'audio_telemetry': bench_audio_telemetry,
+    'direct_vs_ha': bench_direct_vs_ha,
+    'barge_in': bench_barge_in,
+    'first_partial': bench_first_partial,
+}
+
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
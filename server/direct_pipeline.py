@@ -0,0 +1,358 @@
+"""
+Direct pipeline mode for PWA Voice Assist.
+Acts as a Wyoming client to local STT, intent (handle) and TTS services,
+bypassing the Home Assistant round trip.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+from wyoming.asr import Transcribe, Transcript
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event, async_read_event, async_write_event
+from wyoming.handle import Handled, NotHandled
+from wyoming.tts import Synthesize, SynthesizeVoice
+
+from voice_events import RUN_END_MESSAGE, RunEventTranslator
+
+logger = logging.getLogger(__name__)
+
+
+class WyomingConnection:
+    """A persistent TCP connection to a Wyoming service."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @property
+    def alive(self) -> bool:
+        return not (self.reader.at_eof() or self.writer.is_closing())
+
+    async def write_event(self, event: Event):
+        await async_write_event(event, self.writer)
+
+    async def read_event(self, timeout: Optional[float] = None) -> Event:
+        event = await asyncio.wait_for(async_read_event(self.reader), timeout=timeout)
+        if event is None:
+            raise ConnectionError("Wyoming service closed the connection")
+        return event
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+
+class WyomingClientPool:
+    """Pool of persistent connections to one Wyoming service (tcp://host:port)."""
+
+    def __init__(self, uri: str, size: int = 2, connect_timeout: float = 2.0):
+        result = urlparse(uri)
+        if result.scheme != 'tcp' or result.hostname is None or result.port is None:
+            raise ValueError(f"Expected tcp://host:port, got {uri!r}")
+        self.uri = uri
+        self.host = result.hostname
+        self.port = result.port
+        self.size = size
+        self.connect_timeout = connect_timeout
+        self._idle: Deque[WyomingConnection] = deque()
+
+    async def _connect(self) -> WyomingConnection:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.connect_timeout
+        )
+        return WyomingConnection(reader, writer)
+
+    async def acquire(self) -> WyomingConnection:
+        """Reuse an idle connection, or open a new one."""
+        while self._idle:
+            conn = self._idle.popleft()
+            if conn.alive:
+                return conn
+            await conn.close()
+        return await self._connect()
+
+    async def release(self, conn: WyomingConnection, reusable: bool = True):
+        """Return a connection; anything left mid-request must not be reused."""
+        if reusable and conn.alive and len(self._idle) < self.size:
+            self._idle.append(conn)
+        else:
+            await conn.close()
+
+    async def warm_up(self):
+        """Open connections up to the pool size so the first run skips connect()."""
+        while len(self._idle) < self.size:
+            try:
+                self._idle.append(await self._connect())
+            except Exception as e:
+                logger.warning(f"Could not pre-connect to {self.uri}: {e!r}")
+                return
+
+    async def close(self):
+        while self._idle:
+            await self._idle.popleft().close()
+
+
+class DirectPipeline:
+    """
+    Runs wake -> STT -> intent -> TTS against local Wyoming services.
+    Exposes the same trigger_wake_word()/send_audio() entry points as
+    WyomingServer and reports events through the same callback.
+    """
+
+    def __init__(self, stt_uri: str, tts_uri: str, intent_uri: str,
+                 language: Optional[str] = None, voice: Optional[str] = None, pool_size: int = 2,
+                 read_timeout: float = 15.0, speech_rms: int = 300, end_silence_ms: int = 800,
+                 max_listen_s: float = 8.0):
+        """
+        Initialize direct pipeline.
+
+        Args:
+            stt_uri: Wyoming ASR service (tcp://host:port)
+            tts_uri: Wyoming TTS service
+            intent_uri: Wyoming handle service answering a Transcript with Handled/NotHandled
+            language: STT language passed with Transcribe
+            voice: TTS voice name passed with Synthesize
+            pool_size: Persistent connections kept per service
+            read_timeout: Seconds to wait for each service response event
+            speech_rms: Frame RMS above which the uplink counts as speech
+            end_silence_ms: Silence after speech that ends the utterance
+            max_listen_s: Hard limit on the uplink duration of one run
+        """
+        if not (stt_uri and tts_uri and intent_uri):
+            raise ValueError("DirectPipeline needs stt, tts and intent service URIs")
+        self.stt_pool = WyomingClientPool(stt_uri, pool_size)
+        self.tts_pool = WyomingClientPool(tts_uri, pool_size)
+        self.intent_pool = WyomingClientPool(intent_uri, pool_size)
+        self.language = language
+        self.voice = voice
+        self.read_timeout = read_timeout
+        self.speech_rms = speech_rms
+        self.end_silence_ms = end_silence_ms
+        self.max_listen_s = max_listen_s
+        self.event_callback = None
+
+        # Current run
+        self._stt: Optional[WyomingConnection] = None
+        self._tts: Optional[WyomingConnection] = None
+        self._intent: Optional[WyomingConnection] = None
+        self._audio_open = False
+        self._speech_seen = False
+        self._silence_ms = 0.0
+        self._run_task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()  # Serializes trigger_wake_word
+        self._timings: dict = {}
+        self.last_timings: dict = {}
+        self.run_events = RunEventTranslator()
+
+    def set_event_callback(self, callback):
+        self.event_callback = callback
+
+    def _pools(self) -> list:
+        return [self.stt_pool, self.intent_pool, self.tts_pool]
+
+    async def warm_up(self):
+        await asyncio.gather(*[pool.warm_up() for pool in self._pools()])
+
+    async def _emit(self, message, is_binary=False, run_only=False):
+        if self.event_callback:
+            await self.event_callback(message, is_binary=is_binary, run_only=run_only)
+
+    async def _forward(self, event: Event):
+        """Pass a service event on to the browser (see voice_events.TRANSLATIONS)."""
+        for message, run_only in self.run_events.translate(event):
+            await self._emit(message, is_binary=isinstance(message, bytes), run_only=run_only)
+        if 'first_partial' in self.run_events.timings:
+            self._mark('first_partial')
+
+    def _mark(self, name: str):
+        self._timings.setdefault(name, time.perf_counter())
+
+    async def trigger_wake_word(self, wake_word_id: str = "default"):
+        """
+        Start a run, replacing (barging in on) the current one. Setup is serialized:
+        run state lives on the instance, so two wakes at once must not interleave.
+        """
+        async with self._run_lock:
+            await self._start_run(wake_word_id)
+
+    async def _start_run(self, wake_word_id: str):
+        """Open the STT stream and pre-acquire the intent connection (TTS only once there is an answer)."""
+        if self._run_task and not self._run_task.done():
+            logger.info("Barge-in: cancelling the previous run")
+        await self.cancel()
+        logger.info(f"Triggering Wake Word: {wake_word_id} -> direct STT")
+        self._timings = {}
+        self._mark('wake')
+        self.run_events.reset()
+
+        pools = [self.stt_pool, self.intent_pool]
+        results = await asyncio.gather(*[pool.acquire() for pool in pools], return_exceptions=True)
+        if any(isinstance(result, BaseException) for result in results):
+            for pool, result in zip(pools, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Cannot reach {pool.uri}: {result!r}")
+                else:
+                    await pool.release(result)
+            await self._emit(RUN_END_MESSAGE)
+            return
+        self._stt, self._intent = results
+
+        self._speech_seen = False
+        self._silence_ms = 0.0
+        self._run_task = asyncio.create_task(self._run())
+        try:
+            await self._stt.write_event(Transcribe(language=self.language).event())
+            await self._stt.write_event(AudioStart(rate=16000, width=2, channels=1).event())
+        except Exception as e:
+            await self._abort(f"cannot start STT stream: {e!r}")
+            return
+        self._audio_open = True
+
+    async def _abort(self, reason: str):
+        """Drop the current run after a service error and let the browser reset."""
+        logger.error(f"Direct pipeline failed: {reason}")
+        self._audio_open = False
+        await self.cancel()
+        await self._emit(RUN_END_MESSAGE)
+
+    async def send_audio(self, audio_data: bytes):
+        """Stream an uplink frame to STT as it arrives and detect end of speech."""
+        if not self._audio_open:
+            return
+        try:
+            await self._stt.write_event(
+                AudioChunk(rate=16000, width=2, channels=1, audio=audio_data).event()
+            )
+        except Exception as e:
+            await self._abort(f"STT stream write failed: {e!r}")
+            return
+
+        samples = np.frombuffer(audio_data, dtype=np.int16, count=len(audio_data) // 2)
+        if len(samples) == 0:
+            return
+        wide = samples.astype(np.float32)
+        rms = float(np.sqrt(np.dot(wide, wide) / len(wide)))
+        if rms >= self.speech_rms:
+            self._speech_seen = True
+            self._silence_ms = 0.0
+        elif self._speech_seen:
+            self._silence_ms += len(samples) / 16.0
+
+        listened = time.perf_counter() - self._timings['wake']
+        if (self._speech_seen and self._silence_ms >= self.end_silence_ms) or listened >= self.max_listen_s:
+            await self.finish_audio()
+
+    async def finish_audio(self):
+        """End the uplink (end of speech, client 'stop', or timeout)."""
+        if not self._audio_open:
+            return
+        self._audio_open = False
+        self._mark('audio_end')
+        try:
+            await self._stt.write_event(AudioStop().event())
+        except Exception as e:
+            await self._abort(f"STT stream write failed: {e!r}")
+
+    async def _run(self):
+        """Wait for the transcript, then chain intent and TTS as soon as each result lands."""
+        clean = False
+        try:
+            while True:
+                event = await self._stt.read_event(self.read_timeout)
+                if Transcript.is_type(event.type):
+                    break
+                await self._forward(event)  # Partial results of a streaming STT
+            self._mark('transcript')
+            text = Transcript.from_event(event).text
+            logger.info(f"Direct Transcript: {text}")
+            await self.stt_pool.release(self._stt)
+            self._stt = None
+
+            await self._forward(event)  # STT_END
+
+            response = await self._handle(text)
+            if response:
+                # TTS request goes out before the browser is notified
+                synth = asyncio.create_task(self._synthesize(response))
+                await self._forward(Synthesize(text=response).event())  # TTS_START
+                await synth
+            clean = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Direct pipeline failed: {e!r}")
+        finally:
+            self._audio_open = False
+            for pool, conn in ((self.stt_pool, self._stt), (self.tts_pool, self._tts),
+                               (self.intent_pool, self._intent)):
+                if conn is not None:
+                    await pool.release(conn, reusable=clean)
+            self._stt = self._tts = self._intent = None
+            self.last_timings = self._timings
+            self._log_timings()
+
+        await self._emit(RUN_END_MESSAGE)
+
+    async def _handle(self, text: str) -> Optional[str]:
+        await self._intent.write_event(Transcript(text=text).event())
+        while True:
+            event = await self._intent.read_event(self.read_timeout)
+            await self._forward(event)  # Progress, then INTENT_END
+            if Handled.is_type(event.type):
+                response = Handled.from_event(event).text
+                break
+            if NotHandled.is_type(event.type):
+                response = NotHandled.from_event(event).text
+                break
+        self._mark('intent')
+        logger.info(f"Direct Intent response: {response}")
+        await self.intent_pool.release(self._intent)
+        self._intent = None
+        return response
+
+    async def _synthesize(self, text: str):
+        self._tts = await self.tts_pool.acquire()  # Idle pooled connection, warmed up at start
+        voice = SynthesizeVoice(name=self.voice) if self.voice else None
+        await self._tts.write_event(Synthesize(text=text, voice=voice).event())
+        while True:
+            event = await self._tts.read_event(self.read_timeout)
+            if AudioStop.is_type(event.type):
+                break
+            if AudioChunk.is_type(event.type):
+                self._mark('tts_first_audio')
+            await self._forward(event)
+        await self.tts_pool.release(self._tts)
+        self._tts = None
+
+    def _log_timings(self):
+        t = self._timings
+        if 'first_partial' in t:
+            logger.info(f"Direct pipeline: first partial transcript +{(t['first_partial'] - t['wake']) * 1000:.0f}ms after wake")
+        if 'audio_end' in t and 'tts_first_audio' in t:
+            logger.info(
+                f"Direct pipeline: transcript +{(t['transcript'] - t['audio_end']) * 1000:.0f}ms, "
+                f"first TTS audio +{(t['tts_first_audio'] - t['audio_end']) * 1000:.0f}ms after end of speech"
+            )
+
+    async def cancel(self):
+        """Abort the current run, dropping its half-used connections."""
+        if self._run_task and not self._run_task.done():
+            self._run_task.cancel()
+            try:
+                await self._run_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._run_task = None
+
+    async def stop(self):
+        await self.cancel()
+        for pool in self._pools():
+            await pool.close()
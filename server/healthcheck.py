@@ -0,0 +1,25 @@
+"""
+Container readiness probe.
+Exits 0 when the server answers GET /readyz with 200, 1 otherwise.
+Works with and without SSL (the certificate is not verified).
+"""
+import os
+import ssl
+import sys
+import urllib.request
+
+
+def check(port: int, timeout: float = 2.0) -> bool:
+    insecure = ssl._create_unverified_context()
+    for scheme in ('http', 'https'):
+        try:
+            with urllib.request.urlopen(f"{scheme}://127.0.0.1:{port}/readyz", timeout=timeout,
+                                        context=insecure if scheme == 'https' else None) as response:
+                return response.status == 200
+        except Exception:
+            continue
+    return False
+
+
+if __name__ == '__main__':
+    sys.exit(0 if check(int(os.environ.get('PORT', 8765))) else 1)
@@ -0,0 +1,230 @@
+"""
+Opt-in event loop diagnostics for PWA Voice Assist.
+Loop-lag monitor, slow-callback capture (stack + coroutine name, taken by a
+watchdog thread while the loop is blocked), per-coroutine busy time for
+instrumented methods, and an on-demand sampling profiler producing
+collapsed stacks for flamegraphs. Nothing here runs unless enabled.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _stack(frame) -> List:
+    """Frames of a thread stack, outermost first."""
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def _innermost_coroutine(frames) -> Optional[str]:
+    for frame in reversed(frames):
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            return frame.f_code.co_qualname if hasattr(frame.f_code, 'co_qualname') else frame.f_code.co_name
+    return None
+
+
+class CoroutineStats:
+    """Cumulative stats of one instrumented coroutine."""
+
+    __slots__ = ('calls', 'busy', 'wall', 'max_step')
+
+    def __init__(self):
+        self.calls = 0
+        self.busy = 0.0  # Time spent running on the loop (sum of steps)
+        self.wall = 0.0  # Time from call to completion, including awaits
+        self.max_step = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            'calls': self.calls,
+            'busy_ms': round(self.busy * 1000, 3),
+            'wall_ms': round(self.wall * 1000, 3),
+            'max_step_ms': round(self.max_step * 1000, 3),
+        }
+
+
+class _TimedCoroutine:
+    """Drives a coroutine step by step, timing each step it runs on the loop."""
+
+    __slots__ = ('coro', 'stats')
+
+    def __init__(self, coro, stats: CoroutineStats):
+        self.coro = coro
+        self.stats = stats
+
+    def __await__(self):
+        stats = self.stats
+        stats.calls += 1
+        started = time.perf_counter()
+        iterator = self.coro.__await__()
+        value, error = None, None
+        try:
+            while True:
+                step = time.perf_counter()
+                try:
+                    yielded = iterator.throw(error) if error is not None else iterator.send(value)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    elapsed = time.perf_counter() - step
+                    stats.busy += elapsed
+                    if elapsed > stats.max_step:
+                        stats.max_step = elapsed
+                try:
+                    value, error = (yield yielded), None
+                except BaseException as e:
+                    value, error = None, e
+        finally:
+            stats.wall += time.perf_counter() - started
+
+
+class LoopProfiler:
+    """Event loop diagnostics. Create and start() from inside the running loop."""
+
+    def __init__(self, lag_interval_ms: int = 100, slow_callback_ms: int = 100,
+                 asyncio_debug: bool = False, max_slow_callbacks: int = 50):
+        """
+        Initialize profiler.
+
+        Args:
+            lag_interval_ms: Period of the loop-lag probe
+            slow_callback_ms: Loop stall that counts as a slow callback
+            asyncio_debug: Also enable asyncio debug mode (expensive, logs slow callbacks itself)
+            max_slow_callbacks: Recent slow callbacks kept for /debug/loop
+        """
+        self.lag_interval = lag_interval_ms / 1000
+        self.slow_callback = slow_callback_ms / 1000
+        self.asyncio_debug = asyncio_debug
+        self.coroutines: Dict[str, CoroutineStats] = {}
+        self.slow_callbacks: Deque[dict] = deque(maxlen=max_slow_callbacks)
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_samples = 0
+        self.lag_total = 0.0
+
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._lag_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._profile_lock = asyncio.Lock()
+
+    def instrument(self, owner, name: str, label: Optional[str] = None):
+        """Replace owner.name (a coroutine function or method) with a timed wrapper."""
+        original = getattr(owner, name)
+        label = label or getattr(original, '__qualname__', name)
+        stats = self.coroutines.setdefault(label, CoroutineStats())
+
+        @functools.wraps(original)
+        async def timed(*args, **kwargs):
+            return await _TimedCoroutine(original(*args, **kwargs), stats)
+
+        setattr(owner, name, timed)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self.asyncio_debug:
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.slow_callback
+        self._heartbeat = time.monotonic()
+        self._lag_task = asyncio.create_task(self._lag_monitor())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Loop profiling enabled (lag probe {self.lag_interval * 1000:.0f}ms, "
+            f"slow callback {self.slow_callback * 1000:.0f}ms)"
+        )
+
+    async def stop(self):
+        self._stopping.set()
+        if self._lag_task:
+            self._lag_task.cancel()
+
+    async def _lag_monitor(self):
+        """Sleep for a fixed interval and record how late the loop woke us up."""
+        while True:
+            expected = time.monotonic() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_samples += 1
+            self.lag_total += lag
+
+    def _watch(self):
+        """Watchdog thread: when the heartbeat stalls, capture what the loop is running."""
+        reported_beat = None
+        while not self._stopping.wait(self.slow_callback / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat - self.lag_interval
+            if stalled < self.slow_callback or beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            frames = _stack(frame)
+            reported_beat = beat
+            entry = {
+                'at': time.time(),
+                'stalled_ms': round(stalled * 1000, 1),
+                'coroutine': _innermost_coroutine(frames),
+                'stack': [f"{_frame_label(f)}:{f.f_lineno}" for f in frames],
+            }
+            self.slow_callbacks.append(entry)
+            logger.warning(
+                f"Event loop blocked for {entry['stalled_ms']}ms in {entry['coroutine']} "
+                f"at {entry['stack'][-1]}"
+            )
+
+    @property
+    def sampling(self) -> bool:
+        """True while a sample() is running."""
+        return self._profile_lock.locked()
+
+    async def sample(self, seconds: float, interval_ms: float = 5.0) -> str:
+        """Sample the loop thread's stack for a while; returns collapsed stacks."""
+        seconds = min(max(seconds, 0.1), 60.0)
+        async with self._profile_lock:
+            return await asyncio.to_thread(self._sample, seconds, interval_ms / 1000)
+
+    def _sample(self, seconds: float, interval: float) -> str:
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                counts[';'.join(_frame_label(f) for f in _stack(frame))] += 1
+            time.sleep(interval)
+        return '\n'.join(f"{stack} {count}" for stack, count in counts.most_common()) + '\n'
+
+    def snapshot(self) -> dict:
+        return {
+            'lag_ms': {
+                'last': round(self.lag_last * 1000, 2),
+                'max': round(self.lag_max * 1000, 2),
+                'avg': round(self.lag_total / self.lag_samples * 1000, 2) if self.lag_samples else 0.0,
+            },
+            'coroutines': {name: stats.snapshot() for name, stats in self.coroutines.items()},
+            'slow_callbacks': list(self.slow_callbacks),
+        }
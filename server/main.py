@@ -2,6 +2,11 @@
 Hybrid Voice Satellite Server
 Main entry point for the Python server component (ESPHome Protocol).
 """
+import time
+
+# Process start reference for the time-to-ready measurement
+STARTED_AT = time.perf_counter()
+
 import asyncio
 import logging
 import yaml
@@ -9,7 +14,9 @@ import signal
 import sys
 from pathlib import Path
 
-# Import WebSocket and Wyoming modules
+# Import WebSocket and Wyoming modules. Optional subsystems (ssl, audio_telemetry
+# and numpy, loop_profiler, direct_pipeline) are imported inside their config
+# branches below, so a default start never loads them (see test_startup.py).
 from websocket_server import WebSocketServer
 from wyoming_server import WyomingServer
 
@@ -64,11 +71,17 @@ async def main():
     
     server_config = config.get('server', {})
     
+    wyoming_config = config.get('wyoming') or {}
+    
     # Initialize Wyoming Server (Talks to HA)
-    wyoming_port = 10400 # Default Wyoming Port
+    wyoming_port = wyoming_config.get('port', 10400) # Default Wyoming Port
     wyoming_server = WyomingServer(
         host=server_config.get('host', '0.0.0.0'),
-        port=wyoming_port
+        port=wyoming_port,
+        ping_interval=wyoming_config.get('ping_interval', 5.0),
+        ping_timeout=wyoming_config.get('ping_timeout', 10.0),
+        write_timeout=wyoming_config.get('write_timeout', 2.0),
+        failover_buffer_bytes=wyoming_config.get('failover_buffer_bytes', 320000)
     )
     
     # Initialize WebSocket server (Listens for Browsers)
@@ -87,30 +100,112 @@ async def main():
         ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
         ssl_context.load_cert_chain(cert_file, key_file)
     
+    # Uplink audio telemetry (optional, needs numpy)
+    telemetry = None
+    telemetry_config = config.get('telemetry') or {}
+    if telemetry_config.get('enabled', True):
+        try:
+            from audio_telemetry import AudioTelemetry
+            telemetry = AudioTelemetry(
+                block_samples=telemetry_config.get('block_samples', 512),
+                window_blocks=telemetry_config.get('window_blocks', 94),
+                silence_ratio=telemetry_config.get('silence_ratio', 0.95),
+                clipping_ratio=telemetry_config.get('clipping_ratio', 0.01)
+            )
+        except ImportError as e:
+            logger.warning(f"Audio telemetry disabled: {e}")
+    
     ws_server = WebSocketServer(
         host=server_config.get('host', '0.0.0.0'),
         port=server_config.get('port', 8765),
         auth_token=server_config.get('auth_token'),
         ssl_context=ssl_context,
-        client_config=config.get('client', {})
+        client_config=config.get('client', {}),
+        static_preload_max_bytes=server_config.get('static_preload_max_bytes', 2 * 1024 * 1024),
+        telemetry=telemetry,
+        session_budget_bytes=server_config.get('session_budget_bytes', 1024 * 1024),
+        global_budget_bytes=server_config.get('global_budget_bytes', 64 * 1024 * 1024),
+        session_pool_size=server_config.get('session_pool_size', 16)
     )
     
+    # Optional event loop profiling (off by default; zero cost when off)
+    profiler = None
+    profiling_config = config.get('profiling') or {}
+    if profiling_config.get('enabled', False):
+        from loop_profiler import LoopProfiler
+        from wyoming_server import VoiceAssistEventHandler
+        profiler = LoopProfiler(
+            lag_interval_ms=profiling_config.get('lag_interval_ms', 100),
+            slow_callback_ms=profiling_config.get('slow_callback_ms', 100),
+            asyncio_debug=profiling_config.get('asyncio_debug', False)
+        )
+        # Bridge hot paths (must be wrapped before the servers start)
+        profiler.instrument(VoiceAssistEventHandler, 'handle_event', 'VoiceAssistEventHandler.handle_event')
+        profiler.instrument(ws_server, 'handler', 'WebSocketServer.handler')
+        profiler.instrument(ws_server, 'broadcast', 'WebSocketServer.broadcast')
+        profiler.instrument(ws_server, 'broadcast_json', 'WebSocketServer.broadcast_json')
+        ws_server.profiler = profiler
+        # Separate token: server.auth_token is handed to every browser client
+        profiler_token = profiling_config.get('token')
+        if profiler_token and profiler_token == server_config.get('auth_token'):
+            logger.warning("profiling.token must differ from server.auth_token: /debug routes are disabled")
+            profiler_token = None
+        elif not profiler_token:
+            logger.warning("Profiling enabled without profiling.token: /debug routes are disabled")
+        ws_server.profiler_token = profiler_token
+        profiler.start()
+    
     # Link Wyoming Server to WebSocket Server for events
     ws_server.wyoming_ref = wyoming_server
     
     # Callback to bridge events from Wyoming -> WebSocket Clients
-    async def bridge_callback(message, is_binary=False):
-        if is_binary:
-            await ws_server.broadcast(message) # Send bytes directly
+    async def bridge_callback(message, is_binary=False, run_only=False):
+        if run_only:
+            ws_server.send_to_run_client(message) # Partial results: originating client only
+        elif is_binary or isinstance(message, str):
+            await ws_server.broadcast(message) # Send bytes (or pre-serialized JSON) directly
         else:
             await ws_server.broadcast_json(message)
 
     wyoming_server.set_event_callback(bridge_callback)
     
+    # Optional direct pipeline: local Wyoming STT/intent/TTS instead of HA
+    direct_pipeline = None
+    direct_config = config.get('direct_pipeline') or {}
+    if direct_config.get('enabled', False):
+        missing = [key for key in ('stt', 'intent', 'tts') if not direct_config.get(key)]
+        if missing:
+            logger.error(
+                f"direct_pipeline is enabled but {', '.join(missing)} is not set: "
+                f"the direct pipeline needs stt, intent and tts service URIs"
+            )
+            sys.exit(1)
+        from direct_pipeline import DirectPipeline
+        direct_pipeline = DirectPipeline(
+            stt_uri=direct_config['stt'],
+            tts_uri=direct_config['tts'],
+            intent_uri=direct_config['intent'],
+            language=direct_config.get('language'),
+            voice=direct_config.get('voice'),
+            pool_size=direct_config.get('pool_size', 2),
+            speech_rms=direct_config.get('speech_rms', 300),
+            end_silence_ms=direct_config.get('end_silence_ms', 800),
+            max_listen_s=direct_config.get('max_listen_s', 8.0)
+        )
+        direct_pipeline.set_event_callback(bridge_callback)
+        ws_server.direct_ref = direct_pipeline
+        logger.info(
+            f"Direct pipeline enabled: STT {direct_config['stt']}, intent {direct_config['intent']}, "
+            f"TTS {direct_config['tts']}"
+        )
+    
     # Start Services
     # Wyoming runs in a background task because its run() is blocking
     wyoming_task = asyncio.create_task(wyoming_server.start())
     
+    # Not ready while the Wyoming listener is down (e.g. port bind failure)
+    ws_server.readiness_check = lambda: not wyoming_task.done()
+    
     # Shutdown handler
     shutdown_event = asyncio.Event()
     
@@ -125,8 +220,16 @@ async def main():
     signal.signal(signal.SIGTERM, signal_handler)
     
     try:
-        # Start WS Server
+        # Start WS Server: /healthz answers immediately, /readyz after warm-up
         await ws_server.start()
+        await ws_server.warm_up()
+        if direct_pipeline:
+            await direct_pipeline.warm_up()
+        
+        if ws_server.is_ready():
+            logger.info(f"Ready in {(time.perf_counter() - STARTED_AT) * 1000:.0f}ms since process start")
+        else:
+            logger.error("Warm-up finished but a dependency is not ready (see errors above)")
         
         # Keep running
         logger.info("Services started. Press Ctrl+C to stop.")
@@ -141,6 +244,10 @@ async def main():
         logger.info("Shutting down...")
         try:
             wyoming_task.cancel()
+            if profiler:
+                await profiler.stop()
+            if direct_pipeline:
+                await direct_pipeline.stop()
             await ws_server.stop()
         except Exception as e:
             logger.error(f"Error during shutdown: {e}")
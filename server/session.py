@@ -0,0 +1,198 @@
+"""
+Per-client session state for the WebSocket server.
+Every browser connection gets one pooled ClientSession that owns its
+outbound queue, counters and telemetry; a SessionManager enforces
+per-session and global byte budgets on what we buffer for clients.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Union
+
+logger = logging.getLogger(__name__)
+
+Message = Union[str, bytes]
+
+# Close code sent to a client evicted for exceeding its buffer budget ("try again later")
+CLOSE_OVER_BUDGET = 1013
+
+
+class ClientSession:
+    """Compact per-connection state. Instances are pooled and reset on reuse."""
+
+    __slots__ = (
+        'websocket', 'remote_address', 'connected_at',
+        'outbound', 'outbound_bytes', 'wakeup', 'sender',
+        'audio_stats', 'frames_in', 'bytes_in', 'bytes_out', 'evicted',
+    )
+
+    def __init__(self, audio_stats=None):
+        self.websocket = None
+        self.remote_address = None
+        self.connected_at = 0.0
+        self.outbound: Deque[Message] = deque()
+        self.outbound_bytes = 0
+        self.wakeup = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+        self.audio_stats = audio_stats
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.evicted = False
+
+    def reset(self, websocket):
+        self.websocket = websocket
+        self.remote_address = getattr(websocket, 'remote_address', None)
+        self.connected_at = time.monotonic()
+        self.outbound.clear()
+        self.outbound_bytes = 0
+        self.wakeup.clear()
+        self.sender = None
+        if self.audio_stats is not None:
+            self.audio_stats.reset()
+        self.frames_in = self.bytes_in = self.bytes_out = 0
+        self.evicted = False
+
+    def snapshot(self) -> dict:
+        return {
+            'connected_s': round(time.monotonic() - self.connected_at, 1),
+            'frames_in': self.frames_in,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'queued_bytes': self.outbound_bytes,
+        }
+
+
+class SessionManager:
+    """
+    Owns all ClientSessions: hands them out from a preallocated pool and
+    sends their outbound messages from one sender task per session, so a
+    slow client never stalls broadcasts to the others.
+    """
+
+    def __init__(self, session_budget_bytes: int = 1024 * 1024, global_budget_bytes: int = 64 * 1024 * 1024,
+                 pool_size: int = 16, stats_factory: Optional[Callable] = None):
+        """
+        Initialize session manager.
+
+        Args:
+            session_budget_bytes: Outbound bytes one client may have queued before eviction
+            global_budget_bytes: Outbound bytes queued across all clients before the largest is evicted
+            pool_size: Sessions preallocated (and kept for reuse)
+            stats_factory: Creates the per-session telemetry stats object, if any
+        """
+        self.session_budget_bytes = session_budget_bytes
+        self.global_budget_bytes = global_budget_bytes
+        self.pool_size = pool_size
+        self.stats_factory = stats_factory
+        self.sessions: Dict[object, ClientSession] = {}
+        self.buffered_bytes = 0
+        self.evictions = 0
+        self._pool: List[ClientSession] = []
+        self._closing: Set[asyncio.Task] = set()  # Eviction closes in flight (kept referenced)
+
+    def _new_session(self) -> ClientSession:
+        return ClientSession(self.stats_factory() if self.stats_factory else None)
+
+    def preallocate(self):
+        while len(self._pool) < self.pool_size:
+            self._pool.append(self._new_session())
+
+    def open(self, websocket) -> ClientSession:
+        session = self._pool.pop() if self._pool else self._new_session()
+        session.reset(websocket)
+        session.sender = asyncio.create_task(self._send_loop(session))
+        self.sessions[websocket] = session
+        return session
+
+    async def close(self, websocket):
+        session = self.sessions.pop(websocket, None)
+        if session is None:
+            return
+        if session.sender:
+            session.sender.cancel()
+            try:
+                await session.sender
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.purge(session)
+        session.websocket = None
+        if len(self._pool) < self.pool_size:
+            self._pool.append(session)
+
+    def get(self, websocket) -> Optional[ClientSession]:
+        return self.sessions.get(websocket)
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def enqueue(self, session: ClientSession, message: Message) -> bool:
+        """Queue a message for one client. Returns False if the client was evicted instead."""
+        if session.evicted:
+            return False
+        size = len(message)
+        if session.outbound_bytes + size > self.session_budget_bytes:
+            self._evict(session, f"per-session budget ({self.session_budget_bytes} bytes)")
+            return False
+        while self.buffered_bytes + size > self.global_budget_bytes:
+            largest = max(self.sessions.values(), key=lambda s: s.outbound_bytes)
+            if largest.outbound_bytes == 0:
+                largest = session  # Nothing queued to free: the message alone is over budget
+            self._evict(largest, f"global budget ({self.global_budget_bytes} bytes)")
+            if largest is session:
+                return False
+        session.outbound.append(message)
+        session.outbound_bytes += size
+        self.buffered_bytes += size
+        session.wakeup.set()
+        return True
+
+    def broadcast(self, message: Message):
+        for session in list(self.sessions.values()):
+            self.enqueue(session, message)
+
+    def purge(self, session: ClientSession) -> int:
+        """Drop everything queued for a client. Returns the bytes dropped."""
+        dropped = session.outbound_bytes
+        session.outbound.clear()
+        self.buffered_bytes -= dropped
+        session.outbound_bytes = 0
+        return dropped
+
+    def _evict(self, session: ClientSession, reason: str):
+        self.evictions += 1
+        dropped = self.purge(session)
+        session.evicted = True
+        logger.warning(f"Evicting client {session.remote_address}: over {reason}, dropped {dropped} queued bytes")
+        task = asyncio.create_task(session.websocket.close(code=CLOSE_OVER_BUDGET, reason='buffer budget exceeded'))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _send_loop(self, session: ClientSession):
+        websocket = session.websocket
+        try:
+            while True:
+                if not session.outbound:
+                    session.wakeup.clear()
+                    await session.wakeup.wait()
+                    continue
+                message = session.outbound.popleft()
+                size = len(message)
+                session.outbound_bytes -= size
+                self.buffered_bytes -= size
+                await websocket.send(message)
+                session.bytes_out += size
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection gone; the handler's unregister closes the session
+            self.purge(session)
+
+    def stats(self) -> dict:
+        return {
+            'sessions': len(self.sessions),
+            'buffered_bytes': self.buffered_bytes,
+            'evictions': self.evictions,
+            'pool_free': len(self._pool),
+        }
@@ -0,0 +1,58 @@
+import numpy as np
+
+from audio_telemetry import AudioTelemetry, HIST_BINS
+
+
+def _frame(value: int, samples: int = 1024) -> bytes:
+    return np.full(samples, value, dtype=np.int16).tobytes()
+
+
+def test_flags_silent_then_clipping_then_recovers():
+    telemetry = AudioTelemetry(block_samples=512, window_blocks=4)
+    mic = telemetry.new_stats()
+
+    assert telemetry.observe(mic, _frame(0)) is None
+    change = telemetry.observe(mic, _frame(0))
+    assert change['type'] == 'audio_quality' and change['state'] == 'silent'
+
+    telemetry.observe(mic, _frame(32767))
+    assert telemetry.observe(mic, _frame(32767))['state'] == 'clipping'
+
+    telemetry.observe(mic, _frame(3000))
+    assert telemetry.observe(mic, _frame(3000))['state'] == 'ok'
+
+    stats = mic.snapshot()
+    assert stats['blocks'] == 12
+    assert len(stats['rms_hist']) == HIST_BINS and sum(stats['rms_hist']) == 12
+    assert stats['peak'] == 32767
+    assert telemetry.summary([mic]) == {'ok': 1, 'silent': 0, 'clipping': 0}
+
+    mic.reset()
+    assert mic.blocks == 0 and sum(mic.snapshot()['rms_hist']) == 0
+
+
+def test_frame_cost_is_bounded():
+    telemetry = AudioTelemetry(block_samples=512, max_frame_samples=1024)
+    mic = telemetry.new_stats()
+    telemetry.observe(mic, _frame(1000, samples=100_000))
+    assert mic.samples == 1024
+
+
+def test_client_sized_frames_are_fully_analyzed():
+    # 1280-sample frames (client uplink) with a loud tail that straddles 512-sample blocks
+    telemetry = AudioTelemetry(block_samples=512, window_blocks=10)
+    mic = telemetry.new_stats()
+    frame = np.full(1280, 1000, dtype=np.int16)
+    frame[-256:] = 32767
+    changes = [telemetry.observe(mic, frame.tobytes()) for _ in range(4)]
+
+    assert mic.samples == 4 * 1280 and mic.carry_len == 0
+    assert mic.peak == 32767
+    assert mic.clipped_samples == 4 * 256
+    assert changes[-1]['state'] == 'clipping'
+
+
+if __name__ == "__main__":
+    test_flags_silent_then_clipping_then_recovers()
+    test_frame_cost_is_bounded()
+    test_client_sized_frames_are_fully_analyzed()
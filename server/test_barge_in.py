@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event
+
+from test_wyoming_failover import FakeHandler
+from websocket_server import WebSocketServer
+from wyoming_server import WyomingServer
+
+
+class StalledWebSocket:
+    """Browser connection whose sends never complete, so everything stays queued."""
+
+    remote_address = ("10.0.0.1", 1)
+
+    async def send(self, message):
+        await asyncio.Event().wait()
+
+    async def close(self, code=1000, reason=''):
+        pass
+
+
+def test_wake_during_tts_interrupts_and_restarts():
+    async def run():
+        wyoming = WyomingServer("127.0.0.1", 0)
+        ha = FakeHandler(wyoming, 1)
+        ws_server = WebSocketServer('127.0.0.1', 0)
+        ws_server.wyoming_ref = wyoming
+        session = ws_server.sessions.open(StalledWebSocket())
+
+        async def bridge(message, is_binary=False, run_only=False):
+            await ws_server.broadcast(message)
+
+        wyoming.set_event_callback(bridge)
+
+        await ws_server.handle_control_message(json.dumps({'type': 'wake_detected'}), session)
+        await wyoming.send_audio(b"\x00" * 320)
+        await ha.handle_event(Event("transcript", {"text": "turn on the light"}))
+        await ha.handle_event(AudioStart(rate=22050, width=2, channels=1).event())
+        for _ in range(3):
+            await ha.handle_event(AudioChunk(rate=22050, width=2, channels=1, audio=bytes(4096)).event())
+        await asyncio.sleep(0)
+        assert session.outbound_bytes > 3 * 4096
+
+        # Wake word while the answer is still playing
+        ha.written.clear()
+        await ws_server.handle_control_message(json.dumps({'type': 'wake_detected'}), session)
+        assert ha.written == ["played", "run-pipeline", "audio-start"]
+        assert session.outbound_bytes == 0
+
+        # Rest of the old stream is dropped and not acknowledged twice
+        await ha.handle_event(AudioChunk(rate=22050, width=2, channels=1, audio=bytes(4096)).event())
+        await ha.handle_event(AudioStop().event())
+        assert session.outbound_bytes == 0
+        assert ha.written == ["played", "run-pipeline", "audio-start"]
+
+        # Wake word while HA is still listening closes the old uplink first
+        ha.written.clear()
+        await wyoming.trigger_wake_word("again")
+        assert ha.written == ["audio-stop", "run-pipeline", "audio-start"]
+
+        await ws_server.sessions.close(session.websocket)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_wake_during_tts_interrupts_and_restarts()
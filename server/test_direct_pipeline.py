@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import numpy as np
+
+from direct_pipeline import DirectPipeline
+from wyoming_standins import StandinIntent, StandinSTT, StandinTTS, start_standin
+
+
+def _speech(samples: int = 1024) -> bytes:
+    return np.full(samples, 3000, dtype=np.int16).tobytes()
+
+
+def test_direct_run_and_connection_reuse():
+    async def run():
+        servers = []
+        uris = {}
+        for name, cls in (('stt', StandinSTT), ('intent', StandinIntent), ('tts', StandinTTS)):
+            server, uris[name] = await start_standin(cls)
+            servers.append(server)
+
+        pipeline = DirectPipeline(uris['stt'], uris['tts'], intent_uri=uris['intent'], end_silence_ms=100)
+        received = []
+
+        async def callback(message, is_binary=False, run_only=False):
+            if is_binary:
+                received.append('audio')
+            else:
+                message = json.loads(message)
+                received.append(message.get('event_type', message['type']))
+
+        pipeline.set_event_callback(callback)
+        await pipeline.warm_up()
+        idle_stt = list(pipeline.stt_pool._idle)
+
+        for _ in range(2):
+            received.clear()
+            await pipeline.trigger_wake_word("test")
+            for _ in range(3):
+                await pipeline.send_audio(_speech())
+            # Trailing silence ends the utterance without a client 'stop'
+            for _ in range(2):
+                await pipeline.send_audio(bytes(2048))
+            await asyncio.wait_for(pipeline._run_task, timeout=5)
+
+            assert received == [4, 6, 7, 'config_audio', 'tts_first_audio'] + ['audio'] * 5 + [2]
+            assert pipeline.last_timings['tts_first_audio'] >= pipeline.last_timings['transcript']
+
+        # Persistent connections were returned to the pool and reused
+        assert set(idle_stt) & set(pipeline.stt_pool._idle)
+
+        await pipeline.stop()
+        for server in servers:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_unreachable_service_ends_run():
+    async def run():
+        pipeline = DirectPipeline("tcp://127.0.0.1:9", "tcp://127.0.0.1:9", "tcp://127.0.0.1:9")
+        received = []
+
+        async def callback(message, is_binary=False, run_only=False):
+            received.append(json.loads(message))
+
+        pipeline.set_event_callback(callback)
+        await pipeline.trigger_wake_word("test")
+        await pipeline.send_audio(_speech())
+        assert received == [{"type": "voice_event", "event_type": 2, "data": {}}]
+
+    asyncio.run(run())
+
+
+def test_intent_is_required_and_tts_only_used_for_an_answer():
+    try:
+        DirectPipeline("tcp://127.0.0.1:10300", "tcp://127.0.0.1:10200", None)
+        assert False, "intent URI must be required"
+    except ValueError:
+        pass
+
+    async def run():
+        servers, uris = [], {}
+        for name, cls, kwargs in (('stt', StandinSTT, {}), ('intent', StandinIntent, {'reply': ''})):
+            server, uris[name] = await start_standin(cls, **kwargs)
+            servers.append(server)
+
+        # TTS is unreachable: a run without an answer must not need it
+        pipeline = DirectPipeline(uris['stt'], "tcp://127.0.0.1:9", intent_uri=uris['intent'])
+        received = []
+
+        async def callback(message, is_binary=False, run_only=False):
+            received.append(json.loads(message).get('event_type'))
+
+        pipeline.set_event_callback(callback)
+        await pipeline.trigger_wake_word("test")
+        await pipeline.send_audio(_speech())
+        await pipeline.finish_audio()
+        await asyncio.wait_for(pipeline._run_task, timeout=5)
+        assert received == [4, 6, 2]
+        assert 'tts_first_audio' not in pipeline.last_timings
+
+        await pipeline.stop()
+        for server in servers:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_concurrent_wakes_do_not_share_a_run():
+    async def run():
+        servers, uris = [], {}
+        for name, cls in (('stt', StandinSTT), ('intent', StandinIntent), ('tts', StandinTTS)):
+            server, uris[name] = await start_standin(cls)
+            servers.append(server)
+
+        pipeline = DirectPipeline(uris['stt'], uris['tts'], intent_uri=uris['intent'])
+        received = []
+
+        async def callback(message, is_binary=False, run_only=False):
+            received.append('audio' if is_binary else json.loads(message).get('event_type'))
+
+        pipeline.set_event_callback(callback)
+        # Two satellites wake at the same time: the later wake replaces the earlier run
+        await asyncio.gather(pipeline.trigger_wake_word("a"), pipeline.trigger_wake_word("b"))
+        await pipeline.send_audio(_speech())
+        await pipeline.finish_audio()
+        await asyncio.wait_for(pipeline._run_task, timeout=5)
+
+        assert received.count(4) == 1 and 'audio' in received and received[-1] == 2
+
+        await pipeline.stop()
+        for server in servers:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_direct_run_and_connection_reuse()
+    test_unreachable_service_ends_run()
+    test_intent_is_required_and_tts_only_used_for_an_answer()
+    test_concurrent_wakes_do_not_share_a_run()
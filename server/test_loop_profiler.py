@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from loop_profiler import LoopProfiler
+from websocket_server import PROFILE_MAX_SECONDS, WebSocketServer
+
+
+class Worker:
+    async def step(self, block: float):
+        await asyncio.sleep(0.01)
+        time.sleep(block)  # Deliberately block the loop
+        return "done"
+
+
+def test_coroutine_stats_and_slow_callback_capture():
+    async def run():
+        profiler = LoopProfiler(lag_interval_ms=20, slow_callback_ms=50)
+        worker = Worker()
+        profiler.instrument(worker, 'step', 'Worker.step')
+        profiler.start()
+        await asyncio.sleep(0.05)
+
+        assert await worker.step(0.2) == "done"
+        await asyncio.sleep(0.05)
+        await profiler.stop()
+
+        stats = profiler.coroutines['Worker.step']
+        assert stats.calls == 1
+        assert stats.busy >= 0.2 and stats.wall >= stats.busy
+        assert profiler.lag_max >= 0.1
+
+        slow = profiler.slow_callbacks[-1]
+        assert slow['coroutine'] == 'Worker.step'
+        assert any('test_loop_profiler.py:step' in frame for frame in slow['stack'])
+
+    asyncio.run(run())
+
+
+def test_debug_routes_require_token():
+    async def run():
+        server = WebSocketServer('127.0.0.1', 0)
+        assert (await server.process_request('/debug/loop', {}))[0] == 404
+
+        server.profiler = LoopProfiler(lag_interval_ms=20)
+        server.profiler.start()
+        server.profiler_token = 'secret'
+        assert (await server.process_request('/debug/loop', {'Authorization': 'Bearer wrong'}))[0] == 401
+        # Tokens in the URL would be logged: not accepted
+        assert (await server.process_request('/debug/loop?token=secret', {}))[0] == 401
+
+        status, _, body = await server.process_request('/debug/loop', {'Authorization': 'Bearer secret'})
+        assert status == 200 and b'lag_ms' in body
+
+        status, _, body = await server.process_request('/debug/profile?seconds=0.2', {'Authorization': 'Bearer secret'})
+        assert status == 200
+        line = body.decode().splitlines()[0]
+        assert ';' in line and line.rsplit(' ', 1)[1].isdigit()
+        await server.profiler.stop()
+
+    asyncio.run(run())
+
+
+def test_profile_fits_in_the_handshake_timeout():
+    async def run():
+        server = WebSocketServer('127.0.0.1', 0)
+        server.profiler = LoopProfiler()
+        server.profiler_token = 'secret'
+        requested = []
+
+        async def fake_sample(seconds):
+            requested.append(seconds)
+            return "main 1\n"
+
+        server.profiler.sample = fake_sample
+        auth = {'Authorization': 'Bearer secret'}
+        assert (await server.process_request('/debug/profile?seconds=60', auth))[0] == 200
+        assert requested == [PROFILE_MAX_SECONDS]
+
+        # A second request must not queue behind a running sample
+        async with server.profiler._profile_lock:
+            assert (await server.process_request('/debug/profile?seconds=1', auth))[0] == 429
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_coroutine_stats_and_slow_callback_capture()
+    test_debug_routes_require_token()
+    test_profile_fits_in_the_handshake_timeout()
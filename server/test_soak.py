@@ -0,0 +1,124 @@
+"""
+Accelerated soak test: a day of satellites connecting, streaming audio,
+receiving TTS and disconnecting, compressed into a few seconds.
+Set SOAK_SESSIONS to scale (default 4320 = one session every 20s for 24h).
+"""
+import asyncio
+import json
+import os
+import tracemalloc
+
+import numpy as np
+
+from audio_telemetry import AudioTelemetry
+from websocket_server import WebSocketServer
+
+SESSIONS = int(os.environ.get('SOAK_SESSIONS', 4320))
+CONCURRENT = 48
+FRAMES_PER_SESSION = 10
+
+
+class FakeWebSocket:
+    """In-memory stand-in for a browser connection."""
+
+    def __init__(self, index: int, frames: list, stalled: bool = False):
+        self.remote_address = ("10.0.0.1", index)
+        self.frames = frames
+        self.stalled = stalled  # Never drains: sends block forever
+        self.closed = asyncio.Event()
+        self.close_code = None
+
+    def __aiter__(self):
+        return self._messages()
+
+    async def _messages(self):
+        yield json.dumps({'type': 'status_request'})
+        for frame in self.frames:
+            yield frame
+            await asyncio.sleep(0)
+            if self.closed.is_set():
+                return
+
+    async def send(self, message):
+        if self.stalled:
+            await self.closed.wait()
+            raise ConnectionError("closed")
+
+    async def close(self, code=1000, reason=''):
+        self.close_code = code
+        self.closed.set()
+
+
+def _rss_bytes() -> int:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def test_memory_stays_flat_over_a_day_of_sessions():
+    async def run():
+        server = WebSocketServer('127.0.0.1', 0, telemetry=AudioTelemetry(),
+                                 session_budget_bytes=32 * 1024, global_budget_bytes=1024 * 1024)
+        server.sessions.preallocate()
+        frames = [np.full(1024, 1000 + i, dtype=np.int16).tobytes() for i in range(FRAMES_PER_SESSION)]
+        tts = bytes(4096)
+        evicted = []
+
+        async def batch(start: int):
+            sockets = [FakeWebSocket(start + i, frames, stalled=(start + i) % 97 == 0) for i in range(CONCURRENT)]
+            handlers = [asyncio.create_task(server.handler(ws, '/')) for ws in sockets]
+            for _ in range(FRAMES_PER_SESSION):
+                await server.broadcast(tts)
+                await asyncio.sleep(0)
+            await asyncio.gather(*handlers)
+            evicted.extend(ws for ws in sockets if ws.close_code == 1013)
+
+        # Warm-up: let pools, caches and interned objects settle
+        for start in range(0, CONCURRENT * 5, CONCURRENT):
+            await batch(start)
+        await asyncio.sleep(0)
+
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        rss_before = _rss_bytes()
+
+        for start in range(CONCURRENT * 5, SESSIONS, CONCURRENT):
+            await batch(start)
+            assert server.sessions.buffered_bytes <= server.sessions.global_budget_bytes
+        await asyncio.sleep(0)
+
+        final = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        rss_after = _rss_bytes()
+
+        growth = sum(stat.size_diff for stat in final.compare_to(baseline, 'filename'))
+        assert len(server.sessions) == 0
+        assert server.sessions.buffered_bytes == 0
+        assert evicted, "stalled clients must be evicted once over budget"
+        assert growth < 256 * 1024, f"traced memory grew by {growth} bytes"
+        assert rss_after - rss_before < 16 * 1024 * 1024, f"RSS grew by {rss_after - rss_before} bytes"
+
+    asyncio.run(run())
+
+
+def test_eviction_close_task_is_kept_until_done():
+    async def run():
+        from session import SessionManager
+        sessions = SessionManager(session_budget_bytes=1024, global_budget_bytes=4096)
+        ws = FakeWebSocket(1, [], stalled=True)
+        session = sessions.open(ws)
+        sessions.enqueue(session, bytes(512))
+        await asyncio.sleep(0)  # Sender picks up the first message and stalls
+        sessions.enqueue(session, bytes(512))
+        assert not sessions.enqueue(session, bytes(1024))
+        assert session.evicted and len(sessions._closing) == 1
+        for _ in range(2):  # close() runs, then its done callback
+            await asyncio.sleep(0)
+        assert ws.close_code == 1013 and not sessions._closing
+        await sessions.close(ws)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_memory_stays_flat_over_a_day_of_sessions()
+    test_eviction_close_task_is_kept_until_done()
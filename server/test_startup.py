@@ -0,0 +1,54 @@
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from websocket_server import WebSocketServer, build_static_index
+
+
+def test_optional_subsystems_are_not_imported_by_default():
+    optional = ('numpy', 'audio_telemetry', 'loop_profiler', 'direct_pipeline')
+    result = subprocess.run(
+        [sys.executable, '-c', f"import sys, main; print([m for m in {optional!r} if m in sys.modules])"],
+        cwd=Path(__file__).parent, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == '[]'
+
+
+def test_static_index_preloads_app_shell_and_serves_edits():
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            client = Path(tmp)
+            (client / 'app.js').write_text('console.log(1);')
+            (client / 'model.onnx').write_bytes(bytes(256 * 1024))
+            (client / 'cert.pem').write_text('secret')
+
+            server = WebSocketServer('127.0.0.1', 0)
+            server.static_index = build_static_index(client, preload_max_bytes=1024 * 1024)
+            assert set(server.static_index) == {'/app.js', '/model.onnx'}
+            assert server.static_index['/app.js'].content is not None
+            assert server.static_index['/model.onnx'].content is None
+
+            status, headers, body = await server.process_request('/model.onnx', {})
+            assert status == 200 and len(body) == 256 * 1024
+
+            # Edited on disk after warm-up: served without a restart
+            (client / 'app.js').write_text('console.log("edited");')
+            stat = (client / 'app.js').stat()
+            os.utime(client / 'app.js', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+            status, headers, body = await server.process_request('/app.js', {})
+            assert body == b'console.log("edited");'
+            assert ('Content-Length', str(len(body))) in headers
+
+            assert (await server.process_request('/readyz', {}))[0] == 503
+            server.ready = True
+            assert (await server.process_request('/readyz', {}))[0] == 200
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_optional_subsystems_are_not_imported_by_default()
+    test_static_index_preloads_app_shell_and_serves_edits()
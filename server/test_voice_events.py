@@ -0,0 +1,110 @@
+import asyncio
+import json
+from functools import partial
+
+import numpy as np
+from wyoming.asr import Transcript, TranscriptChunk, TranscriptStart
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.tts import Synthesize
+
+from direct_pipeline import DirectPipeline
+from test_wyoming_failover import FakeHandler
+from websocket_server import WebSocketServer
+from wyoming_server import WyomingServer
+from wyoming_standins import StandinIntent, StandinSTT, StandinTTS, start_standin
+
+
+class RecordingWebSocket:
+    def __init__(self, port):
+        self.remote_address = ("10.0.0.1", port)
+        self.received = []
+
+    async def send(self, message):
+        self.received.append('audio' if isinstance(message, bytes) else json.loads(message))
+
+    async def close(self, code=1000, reason=''):
+        pass
+
+
+async def bridge(ws_server, message, is_binary=False, run_only=False):
+    if run_only:
+        ws_server.send_to_run_client(message)
+    else:
+        await ws_server.broadcast(message)
+
+
+def test_partials_reach_only_the_originating_client():
+    async def run():
+        wyoming = WyomingServer("127.0.0.1", 0)
+        ha = FakeHandler(wyoming, 1)
+        ws_server = WebSocketServer('127.0.0.1', 0)
+        ws_server.wyoming_ref = wyoming
+        wyoming.set_event_callback(partial(bridge, ws_server))
+        speaker, other = RecordingWebSocket(1), RecordingWebSocket(2)
+        session = ws_server.sessions.open(speaker)
+        ws_server.sessions.open(other)
+
+        await ws_server.handle_control_message(json.dumps({'type': 'wake_detected'}), session)
+        for event in (
+            TranscriptStart().event(),
+            TranscriptChunk(text="turn on").event(),
+            TranscriptChunk(text=" the light").event(),
+            Transcript(text="turn on the light").event(),
+            Synthesize(text="Done").event(),
+            AudioStart(rate=22050, width=2, channels=1).event(),
+            AudioChunk(rate=22050, width=2, channels=1, audio=bytes(512)).event(),
+            AudioChunk(rate=22050, width=2, channels=1, audio=bytes(512)).event(),
+            AudioStop().event(),
+        ):
+            await ha.handle_event(event)
+        await asyncio.sleep(0.01)
+
+        partials = [m['text'] for m in speaker.received if m != 'audio' and m['type'] == 'voice_partial']
+        assert partials == ["turn on", "turn on the light"]
+        assert any(m != 'audio' and m['type'] == 'tts_first_audio' for m in speaker.received)
+        assert [m if m == 'audio' else m.get('event_type', m['type']) for m in other.received] == \
+            [3, 4, 7, 'config_audio', 'audio', 'audio', 2]
+
+        timings = wyoming.run_events.timings
+        assert timings['first_partial'] <= timings['transcript'] <= timings['tts_first_audio']
+
+    asyncio.run(run())
+
+
+def test_direct_pipeline_streams_partial_transcripts():
+    async def run():
+        servers, uris = [], {}
+        for name, cls, kwargs in (('stt', StandinSTT, {'chunks_per_word': 2}),
+                                  ('intent', StandinIntent, {}), ('tts', StandinTTS, {})):
+            server, uris[name] = await start_standin(cls, **kwargs)
+            servers.append(server)
+
+        pipeline = DirectPipeline(uris['stt'], uris['tts'], intent_uri=uris['intent'])
+        partials = []
+
+        async def callback(message, is_binary=False, run_only=False):
+            if run_only and json.loads(message)['type'] == 'voice_partial':
+                partials.append(json.loads(message)['text'])
+
+        pipeline.set_event_callback(callback)
+        await pipeline.trigger_wake_word("test")
+        for _ in range(4):
+            await pipeline.send_audio(np.full(1024, 3000, dtype=np.int16).tobytes())
+            await asyncio.sleep(0.01)
+        assert partials[-1] == "turn on"  # Before end of speech
+
+        await pipeline.finish_audio()
+        await asyncio.wait_for(pipeline._run_task, timeout=5)
+        assert partials[-1] == "turn on the lights"
+        assert pipeline.last_timings['first_partial'] < pipeline.last_timings['audio_end']
+
+        await pipeline.stop()
+        for server in servers:
+            await server.stop()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_partials_reach_only_the_originating_client()
+    test_direct_pipeline_streams_partial_transcripts()
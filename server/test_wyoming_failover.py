@@ -0,0 +1,165 @@
+import asyncio
+import socket
+
+from wyoming.ping import Pong
+
+import wyoming_server
+from wyoming_server import WyomingServer, VoiceAssistEventHandler
+
+
+class FakeTransport:
+    def __init__(self, buffered: int):
+        self.buffered = buffered
+
+    def get_write_buffer_size(self):
+        return self.buffered
+
+    def get_write_buffer_limits(self):
+        return (16384, 65536)
+
+
+class FakeWriter:
+    def __init__(self, port, transport=None):
+        self.port = port
+        if transport is not None:
+            self.transport = transport
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", self.port) if name == 'peername' else None
+
+    def close(self):
+        pass
+
+
+class FakeHandler(VoiceAssistEventHandler):
+    """Handler that records written events instead of using a socket."""
+
+    def __init__(self, server, port):
+        super().__init__(server, asyncio.StreamReader(), FakeWriter(port))
+        self.written = []
+        self.audio_bytes = 0
+        self.fail = False
+
+    async def write_event(self, event):
+        if self.fail:
+            raise ConnectionResetError("peer gone")
+        self.written.append(event.type)
+        self.audio_bytes += len(event.payload or b"")
+
+
+def test_single_target_and_failover():
+    async def run():
+        server = WyomingServer("127.0.0.1", 0)
+        a = FakeHandler(server, 1)
+        b = FakeHandler(server, 2)
+
+        # b answers pings faster, so it becomes the target
+        for handler, rtt in ((a, 0.050), (b, 0.005)):
+            handler.next_ping()
+            handler.pending_ping -= rtt
+            handler.handle_pong(Pong(text=str(handler.ping_seq)))
+
+        await server.trigger_wake_word("test")
+        await server.send_audio(b"\x00" * 320)
+        await server.send_audio(b"\x00" * 320)
+
+        assert server.active_handler is b
+        assert a.written == []
+        assert b.written == ["run-pipeline", "audio-start", "audio-chunk", "audio-chunk"]
+
+        # Mid-run failure: b is evicted, a gets the run with buffered audio replayed
+        b.fail = True
+        await server.send_audio(b"\x00" * 320)
+
+        assert server.active_handler is a
+        assert b not in server.handlers
+        assert a.written[:2] == ["run-pipeline", "audio-start"]
+        assert a.audio_bytes == 3 * 320
+
+        stats = {s['peer']: s for s in server.get_handler_stats()}
+        assert stats["127.0.0.1:1"]['active'] is True
+        assert stats["127.0.0.1:1"]['rtt_ms'] >= 50.0
+
+    asyncio.run(run())
+
+
+def test_write_timeout_only_when_blocking_and_no_buffering_outside_runs():
+    async def run():
+        server = WyomingServer("127.0.0.1", 0)
+        handler = FakeHandler(server, 1)
+        transport = FakeTransport(buffered=0)
+        handler.writer = FakeWriter(1, transport)
+
+        timed = []
+        original = wyoming_server.asyncio.wait_for
+
+        async def counting_wait_for(awaitable, timeout):
+            timed.append(timeout)
+            return await original(awaitable, timeout)
+
+        wyoming_server.asyncio.wait_for = counting_wait_for
+        try:
+            # Stray audio with no run in progress is forwarded but not kept for failover
+            server.active_handler = handler
+            await server.send_audio(b"\x00" * 320)
+            assert server._run_audio.buffered_bytes == 0
+
+            # Control events are always bounded, audio chunks with room in the buffer are not
+            await server.trigger_wake_word("test")
+            assert len(timed) == 2
+            timed.clear()
+            await server.send_audio(b"\x00" * 320)
+            assert server._run_audio.buffered_bytes == 320
+            assert timed == []
+
+            # A chunk that would cross the high-water mark: the write is bounded by the timeout
+            transport.buffered = 65536 - 320
+            await server.send_audio(b"\x00" * 320)
+            assert timed == [server.write_timeout]
+        finally:
+            wyoming_server.asyncio.wait_for = original
+
+    asyncio.run(run())
+
+
+def test_write_to_a_peer_that_never_reads_times_out():
+    async def run():
+        accepted = []
+
+        async def never_read(reader, writer):
+            accepted.append(writer)  # Keep the connection open, never read
+
+        peer = await asyncio.start_server(never_read, '127.0.0.1', 0)
+        port = peer.sockets[0].getsockname()[1]
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        sock.connect(('127.0.0.1', port))
+        sock.setblocking(False)
+        reader, writer = await asyncio.open_connection(sock=sock)
+
+        server = WyomingServer("127.0.0.1", 0, write_timeout=0.3)
+        handler = VoiceAssistEventHandler(server, reader, writer)
+        await server.trigger_wake_word("test")
+        assert server.active_handler is handler
+
+        async def stream():
+            while server.active_handler is handler:
+                await server.send_audio(b"\x00" * 2560)
+
+        # Every blocking write is bounded: the stuck target gets evicted instead of hanging
+        await asyncio.wait_for(stream(), timeout=10)
+        assert handler.write_errors == 1 and handler not in server.handlers
+
+        writer.close()
+        for w in accepted:
+            w.close()
+        peer.close()
+        await peer.wait_closed()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_single_target_and_failover()
+    test_write_timeout_only_when_blocking_and_no_buffering_outside_runs()
+    test_write_to_a_peer_that_never_reads_times_out()
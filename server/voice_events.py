@@ -0,0 +1,114 @@
+"""
+Wyoming event -> browser message translation for PWA Voice Assist.
+Shared by the HA bridge (WyomingServer) and the direct pipeline. Every
+message is serialized once here and handed to the WebSocket clients as is.
+"""
+import json
+import logging
+import time
+from typing import Dict, List, Tuple, Union
+
+from wyoming.event import Event
+
+logger = logging.getLogger(__name__)
+
+# voice_event codes understood by the client (ESPHome voice assistant numbering)
+RUN_END = 2
+STT_START = 3
+STT_END = 4
+INTENT_END = 6
+TTS_START = 7
+
+RUN_END_MESSAGE = json.dumps({"type": "voice_event", "event_type": RUN_END, "data": {}})
+
+# Wyoming event type -> (stage, step). 'start' opens a stage (sent to every
+# client as the stage's start voice_event, if it has one), 'chunk' extends its
+# text (sent as a partial to the client that started the run), 'final' is the
+# stage result (sent to every client as the stage's voice_event).
+TRANSLATIONS: Dict[str, Tuple[str, str]] = {
+    "transcript-start": ("stt", "start"),
+    "transcript-chunk": ("stt", "chunk"),
+    "transcript": ("stt", "final"),
+    "handled-start": ("intent", "start"),
+    "handled-chunk": ("intent", "chunk"),
+    "handled": ("intent", "final"),
+    "not-handled": ("intent", "final"),
+    "synthesize-start": ("tts", "start"),
+    "synthesize-chunk": ("tts", "chunk"),
+    "synthesize": ("tts", "final"),
+}
+
+START_CODES = {"stt": STT_START}
+FINAL_CODES = {"stt": STT_END, "intent": INTENT_END, "tts": TTS_START}
+
+Message = Union[str, bytes]
+
+
+class RunEventTranslator:
+    """
+    Translates the Wyoming events of one pipeline run into browser messages.
+    Keeps the partial text of each stage and the run's latency marks
+    (ms since reset(): first_partial, transcript, tts_first_audio).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start a new run (on wake)."""
+        self.started = time.perf_counter()
+        self.text: Dict[str, str] = {}
+        self.audio_started = False
+        self.timings: Dict[str, float] = {}
+
+    def _mark(self, name: str):
+        if name not in self.timings:
+            self.timings[name] = round((time.perf_counter() - self.started) * 1000, 1)
+
+    def translate(self, event: Event) -> List[Tuple[Message, bool]]:
+        """
+        Returns (message, run_only) pairs to send, in order. Binary messages are
+        TTS audio; run_only messages are meant for the originating client only.
+        """
+        translation = TRANSLATIONS.get(event.type)
+        if translation is not None:
+            stage, step = translation
+            text = event.data.get("text") or ""
+            if step == "start":
+                self.text[stage] = ""
+                if stage in START_CODES:
+                    return [(json.dumps({"type": "voice_event", "event_type": START_CODES[stage], "data": {}}), False)]
+                return [(json.dumps({"type": "voice_partial", "stage": stage, "text": ""}), True)]
+            if step == "chunk":
+                self.text[stage] = self.text.get(stage, "") + text
+                if self.text[stage].strip():
+                    self._mark("first_partial")
+                return [(json.dumps({"type": "voice_partial", "stage": stage, "text": self.text[stage]}), True)]
+            if stage == "stt":
+                self._mark("transcript")
+            self.text[stage] = text
+            return [(json.dumps({"type": "voice_event", "event_type": FINAL_CODES[stage], "data": {"text": text}}), False)]
+
+        if event.type == "audio-start":
+            self.audio_started = False
+            rate = event.data.get("rate", 22050)
+            return [(json.dumps({"type": "config_audio", "rate": rate}), False)]
+
+        if event.type == "audio-chunk":
+            messages = []
+            if not self.audio_started:
+                self.audio_started = True
+                self._mark("tts_first_audio")
+                messages.append((json.dumps({"type": "tts_first_audio", "ms": self.timings["tts_first_audio"]}), True))
+            messages.append((event.payload or b"", False))
+            return messages
+
+        if event.type == "audio-stop":
+            return [(RUN_END_MESSAGE, False)]
+
+        return []
+
+    def log_timings(self, source: str):
+        t = self.timings
+        if t:
+            logger.info(f"{source} run: " + ", ".join(f"{name} +{ms:.0f}ms" for name, ms in t.items()) + " after wake")
@@ -3,20 +3,117 @@ WebSocket server for handling browser client connections.
 PWA Voice Assist Server.
 """
 import asyncio
+import hmac
 import json
 import logging
+import mimetypes
+import os
+import time
 import websockets
-from typing import Set
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from typing import Callable, Dict, Optional, Union
+
+from session import ClientSession, SessionManager
 
 logger = logging.getLogger(__name__)
 
+# Assuming 'client' is sibling to 'server'
+CLIENT_DIR = Path(__file__).parent.parent / "client"
+
+# HTTP requests (including /debug/profile) are answered inside the opening
+# handshake, which websockets aborts after this many seconds
+OPEN_TIMEOUT = 10
+
+# Longest /debug/profile sample, leaving headroom to send the response
+PROFILE_MAX_SECONDS = OPEN_TIMEOUT - 2
+
+# Never serve TLS material mounted into the client directory
+STATIC_EXCLUDE_SUFFIXES = {'.pem', '.key'}
+
+# Explicitly register .mjs as javascript (needed for some environments)
+mimetypes.add_type('text/javascript', '.mjs')
+mimetypes.add_type('text/javascript', '.js')
+mimetypes.add_type('application/wasm', '.wasm')
+
+
+def _static_headers(mime_type: str, length: int) -> list:
+    return [
+        ('Content-Type', mime_type),
+        ('Content-Length', str(length)),
+        ('Access-Control-Allow-Origin', '*')
+    ]
+
+
+class StaticAsset:
+    """Index entry for one client file: headers are precomputed, content only for small files."""
+
+    __slots__ = ('path', 'mime_type', 'mtime_ns', 'size', 'headers', 'content')
+
+    def __init__(self, path: Path, mime_type: str, stat: os.stat_result, content: Optional[bytes] = None):
+        self.path = path
+        self.mime_type = mime_type
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.headers = _static_headers(mime_type, stat.st_size)
+        self.content = content
+
+    def read(self) -> Optional[bytes]:
+        """
+        Current file content. The file is stat'ed on every request, so edits
+        on disk are served immediately; a cached copy is only used while unchanged.
+        """
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        if stat.st_mtime_ns != self.mtime_ns or stat.st_size != self.size:
+            preloaded = self.content is not None
+            content = self.path.read_bytes()
+            self.mtime_ns, self.size = stat.st_mtime_ns, len(content)
+            self.headers = _static_headers(self.mime_type, len(content))
+            self.content = content if preloaded else None
+            return content
+        if self.content is not None:
+            return self.content
+        return self.path.read_bytes()
+
+
+def build_static_index(client_dir: Path, preload_max_bytes: int,
+                       preload_file_max_bytes: int = 128 * 1024) -> Dict[str, StaticAsset]:
+    """
+    Walk the client directory once and map URL paths to StaticAssets.
+    Only the small app-shell files (up to preload_file_max_bytes each,
+    preload_max_bytes in total) are kept in memory; models and other large
+    files are read from disk on request.
+    """
+    index = {}
+    preloaded = 0
+    for file_path in sorted(client_dir.rglob('*')):
+        if not file_path.is_file() or file_path.suffix in STATIC_EXCLUDE_SUFFIXES:
+            continue
+        mime_type, _ = mimetypes.guess_type(file_path)
+        if not mime_type:
+            mime_type = 'application/octet-stream'
+        stat = file_path.stat()
+        content = None
+        if stat.st_size <= preload_file_max_bytes and preloaded + stat.st_size <= preload_max_bytes:
+            content = file_path.read_bytes()
+            preloaded += stat.st_size
+        url_path = '/' + file_path.relative_to(client_dir).as_posix()
+        index[url_path] = StaticAsset(file_path, mime_type, stat, content)
+    return index
+
 
 class WebSocketServer:
     """
     WebSocket server handling browser connections.
     """
     
-    def __init__(self, host: str, port: int, auth_token: str = None, ssl_context=None, client_config: dict = None):
+    def __init__(self, host: str, port: int, auth_token: str = None, ssl_context=None, client_config: dict = None,
+                 static_preload_max_bytes: int = 2 * 1024 * 1024, telemetry=None,
+                 session_budget_bytes: int = 1024 * 1024, global_budget_bytes: int = 64 * 1024 * 1024,
+                 session_pool_size: int = 16):
         """
         Initialize WebSocket server.
         
@@ -25,13 +122,39 @@ class WebSocketServer:
             port: Server port
             auth_token: Optional authentication token
             ssl_context: Optional SSL context for WSS
+            static_preload_max_bytes: App-shell bytes (files up to 128 KiB) held in memory after warm-up
+            telemetry: Optional AudioTelemetry analyzing every uplink frame
+            session_budget_bytes: Outbound bytes one client may have queued before it is evicted
+            global_budget_bytes: Outbound bytes queued across all clients
+            session_pool_size: Client sessions preallocated during warm-up
         """
         self.host = host
         self.port = port
         self.auth_token = auth_token
         self.client_config = client_config or {}
         self.ssl_context = ssl_context
-        self.clients: Set[websockets.WebSocketServerProtocol] = set()
+        self.sessions = SessionManager(
+            session_budget_bytes=session_budget_bytes,
+            global_budget_bytes=global_budget_bytes,
+            pool_size=session_pool_size,
+            stats_factory=telemetry.new_stats if telemetry else None
+        )
+        self.static_preload_max_bytes = static_preload_max_bytes
+        self.static_index: Dict[str, StaticAsset] = {}
+        self.telemetry = telemetry
+        
+        # Pipelines, linked by main.py
+        self.wyoming_ref = None
+        self.direct_ref = None
+        self.run_client = None  # Websocket whose wake word started the current run
+        
+        # Optional LoopProfiler behind the authenticated /debug/* routes
+        self.profiler = None
+        self.profiler_token: Optional[str] = None
+        
+        # Readiness (/readyz): set by warm_up(), plus an optional external check
+        self.ready = False
+        self.readiness_check: Optional[Callable[[], bool]] = None
         
         # Determine protocol for logging
         self.protocol_scheme = "wss" if self.ssl_context else "ws"
@@ -44,81 +167,145 @@ class WebSocketServer:
             self.port,
             ssl=self.ssl_context,
             process_request=self.process_request,
+            open_timeout=OPEN_TIMEOUT,
             ping_interval=20,
             ping_timeout=20
         )
         logger.info(f"WebSocket server running on {self.protocol_scheme}://{self.host}:{self.port}")
         logger.info(f"Client available at https://{self.host}:{self.port}/")
 
+    async def warm_up(self):
+        """
+        Precompute everything the first clients would otherwise pay for.
+        Runs after start() so /healthz answers while we warm; /readyz and
+        WebSocket upgrades are refused until this completes.
+        """
+        started = time.perf_counter()
+        self.static_index = await asyncio.to_thread(
+            build_static_index, CLIENT_DIR, self.static_preload_max_bytes
+        )
+        preloaded = sum(len(asset.content) for asset in self.static_index.values() if asset.content is not None)
+        self.sessions.preallocate()
+        self.ready = True
+        logger.info(
+            f"Warm-up done in {(time.perf_counter() - started) * 1000:.0f}ms: "
+            f"{len(self.static_index)} static assets indexed, {preloaded // 1024} KiB preloaded, "
+            f"{self.sessions.pool_size} sessions preallocated"
+        )
+
+    def is_ready(self) -> bool:
+        """True once warmed up and every external dependency reports ready."""
+        if not self.ready:
+            return False
+        return self.readiness_check() if self.readiness_check else True
+
     async def process_request(self, path, request_headers):
         """
         Handle HTTP requests to serve static client files.
         This allows serving the client on the same port as the WebSocket,
         resolving mixed content and SSL trust issues.
+        Also answers the /healthz (liveness) and /readyz (readiness) probes.
         """
         try:
             logger.debug(f"Handling HTTP request for path: {path}")
             
-            if path == '/':
-                path = '/index.html'
+            if path.startswith('/debug/'):
+                return await self.process_debug_request(path, request_headers)
             
             # Strip query string if present
             path = path.split('?')[0]
             
-            # Allow WebSocket upgrades to pass through
+            if path == '/healthz':
+                return (200, [('Content-Type', 'text/plain')], b'ok')
+            
+            if path == '/readyz':
+                if self.is_ready():
+                    return (200, [('Content-Type', 'text/plain')], b'ready')
+                return (503, [('Content-Type', 'text/plain')], b'not ready')
+            
+            # Allow WebSocket upgrades to pass through once ready
             if "Upgrade" in request_headers and request_headers["Upgrade"].lower() == "websocket":
+                if not self.is_ready():
+                    return (503, [('Retry-After', '1')], b'503 Service Unavailable')
                 return None
             
+            if path == '/':
+                path = '/index.html'
+            
             # Simple security check
             if '..' in path:
                 return (403, [], b'403 Forbidden')
             
-            # Locate file in client directory
-            from pathlib import Path
-            import mimetypes
-            
-            # Explicitly register .mjs as javascript (needed for some environments)
-            mimetypes.add_type('text/javascript', '.mjs')
-            mimetypes.add_type('text/javascript', '.js')
-            mimetypes.add_type('application/wasm', '.wasm')
-            
-            # Assuming 'client' is sibling to 'server'
-            client_dir = Path(__file__).parent.parent / "client"
-            file_path = client_dir / path.lstrip('/')
-            
-            if file_path.exists() and file_path.is_file():
+            entry = self.static_index.get(path)
+            if entry is None:
+                # Not indexed (added after warm-up, or warm-up still running)
+                file_path = CLIENT_DIR / path.lstrip('/')
+                if file_path.suffix in STATIC_EXCLUDE_SUFFIXES or not file_path.is_file():
+                    return (404, [], b'404 Not Found')
                 mime_type, _ = mimetypes.guess_type(file_path)
-                if not mime_type:
-                    mime_type = 'application/octet-stream'
-                
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                    
-                return (
-                    200,
-                    [
-                        ('Content-Type', mime_type),
-                        ('Content-Length', str(len(content))),
-                        ('Access-Control-Allow-Origin', '*')
-                    ],
-                    content
-                )
+                content = file_path.read_bytes()
+                return (200, _static_headers(mime_type or 'application/octet-stream', len(content)), content)
             
-            return (404, [], b'404 Not Found')
+            content = entry.read()
+            if content is None:
+                return (404, [], b'404 Not Found')
+            return (200, entry.headers, content)
             
         except Exception as e:
             logger.error(f"Error serving HTTP request: {e}")
             return (500, [], b'500 Internal Server Error')
     
-    async def register_client(self, websocket: websockets.WebSocketServerProtocol):
+    async def process_debug_request(self, path, request_headers):
+        """
+        Profiling routes, only when profiling is enabled and a token is configured.
+        The token is accepted only as 'Authorization: Bearer <token>', never in
+        the URL (paths end up in request logs).
+        /debug/loop: loop lag, slow callbacks and coroutine times (JSON).
+        /debug/profile?seconds=N: sampling profile as collapsed stacks (flamegraph input),
+        N capped at PROFILE_MAX_SECONDS so it completes within the handshake timeout.
+        """
+        if not self.profiler or not self.profiler_token:
+            return (404, [], b'404 Not Found')
+        
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        authorization = request_headers.get('Authorization', '')
+        token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+        if not hmac.compare_digest(token.encode(), self.profiler_token.encode()):
+            return (401, [('WWW-Authenticate', 'Bearer')], b'401 Unauthorized')
+        
+        if url.path == '/debug/loop':
+            body = json.dumps(self.profiler.snapshot()).encode()
+            return (200, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))], body)
+        
+        if url.path == '/debug/profile':
+            try:
+                seconds = float(query.get('seconds', ['5'])[0])
+            except ValueError:
+                return (400, [], b'400 Bad Request')
+            if self.profiler.sampling:
+                # Waiting for the running sample could outlast the handshake timeout
+                return (429, [('Retry-After', str(PROFILE_MAX_SECONDS))], b'429 Profile already running')
+            body = (await self.profiler.sample(min(seconds, PROFILE_MAX_SECONDS))).encode()
+            return (200, [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))], body)
+        
+        return (404, [], b'404 Not Found')
+    
+    @property
+    def pipeline(self):
+        """Where wake events and uplink audio go: the direct pipeline if configured, else HA."""
+        return self.direct_ref or self.wyoming_ref
+    
+    async def register_client(self, websocket: websockets.WebSocketServerProtocol) -> ClientSession:
         """Register a new client connection."""
-        self.clients.add(websocket)
-        logger.info(f"Client connected: {websocket.remote_address}. Total clients: {len(self.clients)}")
+        session = self.sessions.open(websocket)
+        logger.info(f"Client connected: {websocket.remote_address}. Total clients: {len(self.sessions)}")
+        return session
     
     async def unregister_client(self, websocket: websockets.WebSocketServerProtocol):
         """Unregister a client connection."""
-        self.clients.discard(websocket)
-        logger.info(f"Client disconnected: {websocket.remote_address}. Total clients: {len(self.clients)}")
+        await self.sessions.close(websocket)
+        logger.info(f"Client disconnected: {websocket.remote_address}. Total clients: {len(self.sessions)}")
     
     async def authenticate(self, websocket: websockets.WebSocketServerProtocol) -> bool:
         """Authenticate incoming WebSocket connection."""
@@ -145,16 +332,21 @@ class WebSocketServer:
             await websocket.close(code=1008)
             return
         
-        await self.register_client(websocket)
+        session = await self.register_client(websocket)
         
         try:
             async for message in websocket:
                 if isinstance(message, bytes):
-                    # Forward audio to Wyoming/Home Assistant
-                    if hasattr(self, 'wyoming_ref') and self.wyoming_ref:
-                        await self.wyoming_ref.send_audio(message)
+                    session.frames_in += 1
+                    session.bytes_in += len(message)
+                    if self.telemetry:
+                        self.report_audio_quality(session, message)
+                    # Forward audio to Wyoming/Home Assistant (or the direct pipeline)
+                    pipeline = self.pipeline
+                    if pipeline:
+                        await pipeline.send_audio(message)
                 else:
-                    await self.handle_control_message(message, websocket)
+                    await self.handle_control_message(message, session)
                     
         except websockets.exceptions.ConnectionClosed:
             pass
@@ -163,7 +355,21 @@ class WebSocketServer:
         finally:
             await self.unregister_client(websocket)
     
-    async def handle_control_message(self, message: str, websocket: websockets.WebSocketServerProtocol):
+    def report_audio_quality(self, session: ClientSession, frame: bytes):
+        """Feed an uplink frame to telemetry and notify the client when its mic state changes."""
+        change = self.telemetry.observe(session.audio_stats, frame)
+        if not change:
+            return
+        if change['state'] == 'ok':
+            logger.info(f"Audio quality recovered for {session.remote_address}")
+        else:
+            logger.warning(
+                f"Audio quality {change['state']} for {session.remote_address} "
+                f"(silence={change['silence_ratio']}, clipping={change['clipping_ratio']})"
+            )
+        self.sessions.enqueue(session, json.dumps(change))
+    
+    async def handle_control_message(self, message: str, session: ClientSession):
         """Process control/JSON messages from browser."""
         try:
             data = json.loads(message)
@@ -173,46 +379,71 @@ class WebSocketServer:
                 wake_word = data.get('wake_word', 'default')
                 logger.info(f"Wake word detected by client: {wake_word}")
                 
-                # Trigger Wyoming Event
-                if hasattr(self, 'wyoming_ref') and self.wyoming_ref:
-                    await self.wyoming_ref.trigger_wake_word(wake_word)
+                self.run_client = session.websocket
+                
+                # Barge-in: whatever is still queued for this client belongs to the previous run
+                dropped = self.sessions.purge(session)
+                if dropped:
+                    logger.info(f"Barge-in: dropped {dropped} queued bytes for {session.remote_address}")
+                
+                # Trigger Wyoming Event (interrupts the previous run before any further await)
+                pipeline = self.pipeline
+                if pipeline:
+                    await pipeline.trigger_wake_word(wake_word)
                 else:
                     logger.warning("Wyoming reference not found, cannot trigger HA pipeline")
                 
+            elif msg_type == 'stop':
+                # Client ended listening; only the direct pipeline owns end of speech
+                if self.direct_ref:
+                    await self.direct_ref.finish_audio()
+                
             elif msg_type == 'ping':
-                await websocket.send(json.dumps({'type': 'pong'}))
+                self.sessions.enqueue(session, json.dumps({'type': 'pong'}))
                 
             elif msg_type == 'status_request':
                 ha_status = False
-                if hasattr(self, 'wyoming_ref') and self.wyoming_ref:
+                ha_targets = []
+                if self.wyoming_ref:
                     ha_status = len(self.wyoming_ref.handlers) > 0
+                    ha_targets = self.wyoming_ref.get_handler_stats()
                 
-                await websocket.send(json.dumps({
+                status = {
                     'type': 'status',
-                    'clients': len(self.clients),
+                    'clients': len(self.sessions),
                     'ha_connected': ha_status,
+                    'ha_targets': ha_targets,
+                    'pipeline': 'direct' if self.direct_ref else 'ha',
+                    'session': session.snapshot(),
+                    'buffers': self.sessions.stats(),
                     'config': self.client_config
-                }))
+                }
+                if self.telemetry:
+                    status['audio_quality'] = {
+                        'fleet': self.telemetry.summary(s.audio_stats for s in self.sessions.sessions.values()),
+                        'session': session.audio_stats.snapshot()
+                    }
+                
+                self.sessions.enqueue(session, json.dumps(status))
                 
         except Exception as e:
             logger.error(f"Error handling control message: {e}")
             
     async def broadcast_json(self, message_dict: dict):
-        """Broadcast a JSON message to all clients."""
-        if self.clients:
-            payload = json.dumps(message_dict)
-            await asyncio.gather(
-                *[client.send(payload) for client in self.clients],
-                return_exceptions=True
-            )
+        """Broadcast a JSON message to all clients (queued per session, within budget)."""
+        if self.sessions:
+            self.sessions.broadcast(json.dumps(message_dict))
 
-    async def broadcast(self, message: bytes):
-        """Broadcast binary message to all clients."""
-        if self.clients:
-            await asyncio.gather(
-                *[client.send(message) for client in self.clients],
-                return_exceptions=True
-            )
+    async def broadcast(self, message: Union[bytes, str]):
+        """Broadcast binary (or already serialized JSON) message to all clients (queued per session, within budget)."""
+        if self.sessions:
+            self.sessions.broadcast(message)
+    
+    def send_to_run_client(self, message: Union[bytes, str]):
+        """Send to the client that started the current run only (partial results); dropped if it left."""
+        session = self.sessions.get(self.run_client)
+        if session:
+            self.sessions.enqueue(session, message)
     
     async def stop(self):
         """Stop the WebSocket server."""
@@ -221,11 +452,13 @@ class WebSocketServer:
             await self.server.wait_closed()
         
         # Close all active connections
-        if self.clients:
+        websockets_open = list(self.sessions.sessions)
+        if websockets_open:
             await asyncio.gather(
-                *[client.close() for client in self.clients],
+                *[client.close() for client in websockets_open],
                 return_exceptions=True
             )
-            self.clients.clear()
+            for client in websockets_open:
+                await self.sessions.close(client)
         
         logger.info("WebSocket server stopped")
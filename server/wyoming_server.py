@@ -4,7 +4,8 @@ Handles the connection to Home Assistant and bridges wake word events.
 """
 import asyncio
 import logging
-from typing import Optional, Set
+import time
+from typing import List, Optional, Set
 from wyoming.server import AsyncServer, AsyncEventHandler
 from wyoming.event import Event
 from wyoming.pipeline import RunPipeline, PipelineStage
@@ -12,25 +13,68 @@ from wyoming.info import Describe, Info, Satellite, Attribution
 from wyoming.ping import Ping, Pong
 from wyoming.audio import AudioChunk, AudioStart, AudioStop
 
+from audio_buffer import AudioBuffer
+from voice_events import RunEventTranslator
+
 logger = logging.getLogger(__name__)
 
+# Upper bound of an audio event's JSON header + data, for the post-write buffer estimate
+_EVENT_HEADER_BYTES = 1024
+
 class VoiceAssistEventHandler(AsyncEventHandler):
     """Event Handler for a single Wyoming client connection."""
     
     def __init__(self, wyoming_server, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         super().__init__(reader, writer)
         self.wyoming_server = wyoming_server
+
+        # Health tracking (see WyomingServer.select_target)
+        self.connected_at = time.monotonic()
+        self.last_seen = self.connected_at
+        self.rtt: Optional[float] = None  # Seconds, from our Ping -> HA Pong
+        self.pending_ping: Optional[float] = None  # monotonic() of unanswered Ping
+        self.ping_seq = 0
+        self.write_errors = 0
+        self.healthy = True
+
+        # TTS stream from HA (see WyomingServer.interrupt_run)
+        self.tts_streaming = False
+        self.tts_interrupted = False  # Barged in: drop the rest of the stream, already acknowledged
+
         self.wyoming_server.register_handler(self)
 
+    @property
+    def peer(self) -> str:
+        """Remote address of the HA connection, for logs and stats."""
+        peername = self.writer.get_extra_info('peername') if self.writer else None
+        if peername:
+            return f"{peername[0]}:{peername[1]}"
+        return "unknown"
+
     async def handle_event(self, event: Event) -> bool:
         """Handle incoming events from Home Assistant."""
+        self.last_seen = time.monotonic()
+
         if Describe.is_type(event.type):
             await self.send_info()
             return True
         
         if Ping.is_type(event.type):
-            await self.write_event(Pong().event())
+            await self.write_event(Pong(text=Ping.from_event(event).text).event())
+            return True
+
+        if Pong.is_type(event.type):
+            self.handle_pong(Pong.from_event(event))
+            return True
+
+        if self.tts_interrupted and (AudioChunk.is_type(event.type) or AudioStop.is_type(event.type)):
+            if AudioStop.is_type(event.type):
+                self.tts_interrupted = False
             return True
+
+        if AudioStart.is_type(event.type):
+            self.tts_streaming = True
+            self.tts_interrupted = False
             
         # Bridge events to WebSocket clients
         if hasattr(self.wyoming_server, 'event_callback') and self.wyoming_server.event_callback:
@@ -38,6 +82,7 @@ class VoiceAssistEventHandler(AsyncEventHandler):
 
         # ACK AudioStop with Played to release HA Media Player state
         if AudioStop.is_type(event.type):
+            self.tts_streaming = False
             logger.info("Received AudioStop from HA, sending 'played' event")
             await self.write_event(Event("played"))
 
@@ -58,6 +103,30 @@ class VoiceAssistEventHandler(AsyncEventHandler):
         await self.write_event(info.event())
         logger.debug("Sent Describe Info")
 
+    def next_ping(self) -> Event:
+        """Build the next health Ping; the matching Pong updates the round-trip time."""
+        self.ping_seq += 1
+        self.pending_ping = time.monotonic()
+        return Ping(text=str(self.ping_seq)).event()
+
+    def handle_pong(self, pong: Pong):
+        """Record the round-trip time of our last Ping."""
+        if self.pending_ping is None or pong.text != str(self.ping_seq):
+            return  # Stale or unsolicited Pong
+        self.rtt = time.monotonic() - self.pending_ping
+        self.pending_ping = None
+
+    def stats(self) -> dict:
+        """Health snapshot exposed via WyomingServer.get_handler_stats()."""
+        return {
+            'peer': self.peer,
+            'healthy': self.healthy,
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            'write_errors': self.write_errors,
+            'idle_s': round(time.monotonic() - self.last_seen, 1),
+            'active': self is self.wyoming_server.active_handler,
+        }
+
     async def disconnect(self) -> None:
         """Called when client disconnects."""
         self.wyoming_server.unregister_handler(self)
@@ -69,65 +138,54 @@ class WyomingServer:
     Wyoming protocol server.
     Advertises itself as a Satellite to Home Assistant.
     """
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, ping_interval: float = 5.0, ping_timeout: float = 10.0,
+                 write_timeout: float = 2.0, failover_buffer_bytes: int = 320000):
+        """
+        Initialize Wyoming server.
+
+        Args:
+            host: Server host address
+            port: Server port
+            ping_interval: Seconds between health Pings to each HA connection
+            ping_timeout: Seconds without a Pong before a handler is evicted
+            write_timeout: Seconds a single write may block before the handler is considered dead
+            failover_buffer_bytes: Audio of the current run kept for replay on failover (320000 = 10s)
+        """
         self.host = host
         self.port = port
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.write_timeout = write_timeout
         self.server: Optional[AsyncServer] = None
         self.handlers: Set[VoiceAssistEventHandler] = set()
         self.event_callback = None # Callback to send data to WebSocket clients
+
+        # Single HA target for the current pipeline run
+        self.active_handler: Optional[VoiceAssistEventHandler] = None
+        self._run_wake_word: Optional[str] = None  # Set while a pipeline run is in progress
+        self._run_audio = AudioBuffer(chunk_duration_ms=100, capacity=failover_buffer_bytes)
+        self._health_task: Optional[asyncio.Task] = None
+        self._audio_log_counter = 0
+        self.run_events = RunEventTranslator()
     
     def set_event_callback(self, callback):
         self.event_callback = callback
 
     async def handle_external_event(self, event: Event):
-        """Translate Wyoming events to PWA JSON events."""
+        """Translate Wyoming events to PWA messages (see voice_events.TRANSLATIONS)."""
         if not self.event_callback:
             return
 
         try:
-            # 1. Transcript (STT Text)
-            if event.type == "transcript":
-                text = event.data.get("text", "")
-                logger.info(f"Received Transcript: {text}")
-                await self.event_callback({
-                    "type": "voice_event",
-                    "event_type": 4, # STT_END
-                    "data": {"text": text}
-                })
-
-            # 2. Synthesize (TTS Text)
-            elif event.type == "synthesize":
-                text = event.data.get("text", "")
-                logger.info(f"Received Synthesize: {text}")
-                await self.event_callback({
-                    "type": "voice_event",
-                    "event_type": 7, # TTS_START
-                    "data": {"text": text}
-                })
-            
-            # 3. Audio Start (TTS Config)
-            elif event.type == "audio-start":
-                data = event.data
-                rate = data.get("rate", 22050)
-                logger.info(f"Received AudioStart: {rate}Hz")
-                await self.event_callback({
-                    "type": "config_audio",
-                    "rate": rate
-                })
-
-            # 4. Audio Chunk (TTS Audio)
-            elif event.type == "audio-chunk":
-                # Extract raw audio
-                payload = event.payload
-                await self.event_callback(payload, is_binary=True)
-                
-            # 4. Audio Stop (TTS Finished)
-            elif event.type == "audio-stop":
-                await self.event_callback({
-                    "type": "voice_event",
-                    "event_type": 2, # RUN_END
-                    "data": {}
-                })
+            if not event.type.endswith("-chunk"):
+                logger.info(f"Received {event.type}: {event.data}")
+            if event.type in ("transcript", "audio-stop"):
+                self._run_wake_word = None  # HA closed the uplink
+            if event.type == "audio-stop":
+                self.run_events.log_timings("HA")
+
+            for message, run_only in self.run_events.translate(event):
+                await self.event_callback(message, is_binary=isinstance(message, bytes), run_only=run_only)
                 
         except Exception as e:
             logger.error(f"Error handling external event: {e}")
@@ -136,6 +194,7 @@ class WyomingServer:
         """Start the Wyoming server."""
         self.server = AsyncServer.from_uri(f"tcp://{self.host}:{self.port}")
         logger.info(f"Wyoming server running on tcp://{self.host}:{self.port}")
+        self._health_task = asyncio.create_task(self._health_loop())
         # Run blocks, so this needs to be awaited in a task (which it is in main.py)
         await self.server.run(self._make_handler)
 
@@ -153,7 +212,11 @@ class WyomingServer:
             }))
 
     def unregister_handler(self, handler: VoiceAssistEventHandler):
+        if handler not in self.handlers:
+            return
         self.handlers.discard(handler)
+        if handler is self.active_handler:
+            self.active_handler = None
         logger.info(f"Wyoming client disconnected. Total: {len(self.handlers)}")
         if self.event_callback:
             asyncio.create_task(self.event_callback({
@@ -161,17 +224,65 @@ class WyomingServer:
                 'connected': len(self.handlers) > 0
             }))
 
-    async def trigger_wake_word(self, wake_word_id: str = "default"):
+    def get_handler_stats(self) -> List[dict]:
+        """Health and selection state of every connected HA instance."""
+        return [handler.stats() for handler in self.handlers]
+
+    def select_target(self, exclude: Optional[VoiceAssistEventHandler] = None) -> Optional[VoiceAssistEventHandler]:
         """
-        Trigger a wake word detection event.
-        This tells HA to start the pipeline at the STT stage.
+        Pick the single HA connection a pipeline run is sent to.
+        Prefers healthy handlers with the lowest measured RTT; handlers that
+        have not answered a Ping yet rank after measured ones, oldest first.
         """
-        if not self.handlers:
-            logger.warning("No Wyoming clients connected. cannot trigger wake word.")
-            return
+        candidates = [h for h in self.handlers if h.healthy and h is not exclude]
+        if not candidates:
+            return None
+        return min(
+            candidates,
+            key=lambda h: (h.rtt is None, h.rtt or 0.0, h.write_errors, h.connected_at)
+        )
 
-        logger.info(f"Triggering Wake Word: {wake_word_id} -> RunPipeline(start_stage=STT)")
-        
+    @staticmethod
+    def _write_may_block(handler: VoiceAssistEventHandler, event: Event) -> bool:
+        """
+        True if drain() could wait after writing event: only audio chunks that
+        keep the transport under its high-water mark (header included) are safe.
+        """
+        transport = getattr(handler.writer, 'transport', None)
+        if transport is None or not event.payload:
+            return True
+        after_write = transport.get_write_buffer_size() + len(event.payload) + _EVENT_HEADER_BYTES
+        return after_write >= transport.get_write_buffer_limits()[1]
+
+    async def _write(self, handler: VoiceAssistEventHandler, event: Event) -> bool:
+        """
+        Write one event. Returns False (and marks the handler unhealthy) on failure.
+        The write timeout (a Task per call) applies unless the write cannot block.
+        """
+        try:
+            if self._write_may_block(handler, event):
+                await asyncio.wait_for(handler.write_event(event), timeout=self.write_timeout)
+            else:
+                await handler.write_event(event)
+            return True
+        except Exception as e:
+            handler.write_errors += 1
+            handler.healthy = False
+            logger.error(f"Failed to send {event.type} to {handler.peer}: {e!r}")
+            return False
+
+    async def _evict(self, handler: VoiceAssistEventHandler, reason: str):
+        """Drop a dead HA connection."""
+        logger.warning(f"Evicting Wyoming client {handler.peer}: {reason}")
+        handler.healthy = False
+        self.unregister_handler(handler)
+        try:
+            await handler.stop()
+        except Exception as e:
+            logger.debug(f"Error stopping evicted handler: {e}")
+
+    def _pipeline_events(self) -> List[Event]:
+        """RunPipeline + AudioStart that open a run on a target."""
         # Create RunPipeline event
         pipeline_event = RunPipeline(
             start_stage=PipelineStage.ASR,
@@ -185,44 +296,144 @@ class WyomingServer:
             width=2,
             channels=1
         ).event()
+        return [pipeline_event, audio_start_event]
+
+    @staticmethod
+    def _audio_event(audio_data: bytes) -> Event:
+        # Create AudioChunk event (16kHz, 16-bit mono)
+        return AudioChunk(
+            rate=16000,
+            width=2,
+            channels=1,
+            audio=audio_data
+        ).event()
+
+    async def _start_run_on(self, handler: VoiceAssistEventHandler) -> bool:
+        """Open the current run on handler and replay the audio buffered so far."""
+        for event in self._pipeline_events():
+            if not await self._write(handler, event):
+                return False
+        for audio_data in self._run_audio.chunks():
+            if not await self._write(handler, self._audio_event(audio_data)):
+                return False
+        return True
+
+    async def _failover(self, failed: Optional[VoiceAssistEventHandler]) -> Optional[VoiceAssistEventHandler]:
+        """Evict the failed target and restart the current run on the next best one."""
+        if failed is not None:
+            await self._evict(failed, "write failed during pipeline run")
+
+        while True:
+            target = self.select_target(exclude=failed)
+            if target is None:
+                logger.error("No healthy Wyoming clients left, dropping pipeline run")
+                self.active_handler = None
+                self._run_wake_word = None
+                return None
+
+            logger.warning(
+                f"Failing over pipeline to {target.peer} "
+                f"(resending {self._run_audio.buffered_bytes} buffered bytes)"
+            )
+            self.active_handler = target
+            if await self._start_run_on(target):
+                return target
+            await self._evict(target, "write failed during failover")
+            failed = target
+
+    async def interrupt_run(self) -> bool:
+        """
+        Barge-in: end what the previous run still has in flight before a new one starts.
+        TTS being streamed to us is acknowledged with 'played' (so HA finishes that run)
+        and its remaining chunks are dropped; an uplink HA is still listening to gets
+        an AudioStop. Returns True if anything was interrupted.
+        """
+        # Flag streams first, without awaiting, so no further chunk reaches the clients
+        playing = [h for h in self.handlers if h.tts_streaming]
+        for handler in playing:
+            handler.tts_streaming = False
+            handler.tts_interrupted = True
+
+        listening = self.active_handler if self._run_wake_word is not None else None
+        if listening is not None:
+            logger.info(f"Barge-in: closing the uplink of the previous run on {listening.peer}")
+            await self._write(listening, AudioStop().event())
+        for handler in playing:
+            logger.info(f"Barge-in: stopping TTS playback from {handler.peer}")
+            await self._write(handler, Event("played"))
+        return bool(playing or listening)
+
+    async def trigger_wake_word(self, wake_word_id: str = "default"):
+        """
+        Trigger a wake word detection event.
+        This tells HA to start the pipeline at the STT stage.
+        Only one HA instance (see select_target) receives the run.
+        """
+        if not self.handlers:
+            logger.warning("No Wyoming clients connected. cannot trigger wake word.")
+            return
+
+        await self.interrupt_run()
+        logger.info(f"Triggering Wake Word: {wake_word_id} -> RunPipeline(start_stage=STT)")
+
+        self._run_wake_word = wake_word_id
+        self._run_audio.clear()
+        self.run_events.reset()
+
+        target = self.select_target()
+        if target is None:
+            logger.warning("No healthy Wyoming clients connected. cannot trigger wake word.")
+            self._run_wake_word = None
+            return
 
-        # Broadcast to all connected HA instances
-        # We need to copy the set to avoid modification during iteration if something disconnects rapidly
-        for handler in list(self.handlers):
-            try:
-                await handler.write_event(pipeline_event)
-                await handler.write_event(audio_start_event)
-            except Exception as e:
-                logger.error(f"Failed to send event to client: {e}")
+        self.active_handler = target
+        logger.info(f"Pipeline target: {target.peer} (rtt={target.stats()['rtt_ms']}ms)")
+        if not await self._start_run_on(target):
+            await self._failover(target)
 
     async def send_audio(self, audio_data: bytes):
         """
-        Send audio chunk to Home Assistant.
+        Send audio chunk to the Home Assistant instance handling the current run.
         """
         if not self.handlers:
             return
         
         # DEBUG: Log occasionally
-        if not hasattr(self, '_audio_log_counter'):
-            self._audio_log_counter = 0
         self._audio_log_counter += 1
         if self._audio_log_counter % 50 == 0:
             logger.info(f"Sending audio chunk to HA ({len(audio_data)} bytes)")
 
-        # Create AudioChunk event (16kHz, 16-bit mono)
-        chunk = AudioChunk(
-            rate=16000,
-            width=2,
-            channels=1,
-            audio=audio_data
-        ).event()
-        
-        # Broadcast to all connected HA instances
-        for handler in list(self.handlers):
-            try:
-                await handler.write_event(chunk)
-            except Exception as e:
-                logger.error(f"Failed to send audio chunk: {e}")
+        # Keep the run's audio so a failover target receives it from the start
+        if self._run_wake_word is not None and not self._run_audio.add(audio_data) \
+                and self._run_audio.dropped_bytes == len(audio_data):
+            logger.warning("Failover buffer full, later audio of this run won't be replayed")
+
+        handler = self.active_handler
+        if handler is None:
+            # Target disconnected mid-run: _failover replays this chunk too
+            if self._run_wake_word is not None:
+                await self._failover(None)
+            return
+
+        if not await self._write(handler, self._audio_event(audio_data)):
+            await self._failover(handler)
+
+    async def _health_loop(self):
+        """Ping every HA connection and evict those that stop answering."""
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            for handler in list(self.handlers):
+                if handler.pending_ping is not None:
+                    waited = now - handler.pending_ping
+                    if waited <= self.ping_timeout:
+                        continue
+                    # Only evict peers that have proven they answer Pings
+                    if handler.rtt is not None:
+                        await self._evict(handler, f"no Pong for {waited:.1f}s")
+                        continue
+                if not await self._write(handler, handler.next_ping()):
+                    await self._evict(handler, "ping write failed")
 
     async def stop(self):
         """Stop the server."""
@@ -231,3 +442,5 @@ class WyomingServer:
             # as it blocks. But since we run it in a Task in main.py, cancelling that task 
             # stops the run loop. We should just ensure handlers are closed.
             pass
+        if self._health_task:
+            self._health_task.cancel()
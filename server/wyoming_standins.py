@@ -0,0 +1,95 @@
+"""
+Minimal local Wyoming services for tests and benchmarks.
+STT answers with a fixed transcript (optionally streamed word by word
+while audio arrives), the handle service echoes it,
+TTS streams a few chunks of silence. Delays simulate model time.
+"""
+import asyncio
+from functools import partial
+from typing import Optional, Tuple
+
+from wyoming.asr import Transcribe, Transcript, TranscriptChunk, TranscriptStart, TranscriptStop
+from wyoming.audio import AudioChunk, AudioStart, AudioStop
+from wyoming.event import Event
+from wyoming.handle import Handled
+from wyoming.server import AsyncEventHandler, AsyncServer
+from wyoming.tts import Synthesize
+
+
+class StandinSTT(AsyncEventHandler):
+    def __init__(self, reader, writer, text: str = "turn on the lights", delay: float = 0.0,
+                 chunks_per_word: int = 0):
+        super().__init__(reader, writer)
+        self.text = text
+        self.delay = delay
+        self.chunks_per_word = chunks_per_word  # 0: no partial results
+        self.audio_bytes = 0
+        self.audio_chunks = 0
+        self.words_sent = 0
+
+    async def _send_words(self, count: int):
+        words = self.text.split()[self.words_sent:self.words_sent + count]
+        if words:
+            prefix = " " if self.words_sent else ""
+            self.words_sent += len(words)
+            await self.write_event(TranscriptChunk(text=prefix + " ".join(words)).event())
+
+    async def handle_event(self, event: Event) -> bool:
+        if Transcribe.is_type(event.type) or AudioStart.is_type(event.type):
+            self.audio_bytes = self.audio_chunks = self.words_sent = 0
+            if self.chunks_per_word and AudioStart.is_type(event.type):
+                await self.write_event(TranscriptStart().event())
+        elif AudioChunk.is_type(event.type):
+            self.audio_bytes += len(event.payload or b"")
+            self.audio_chunks += 1
+            if self.chunks_per_word and self.audio_chunks % self.chunks_per_word == 0:
+                await self._send_words(1)
+        elif AudioStop.is_type(event.type):
+            await asyncio.sleep(self.delay)
+            if self.chunks_per_word:
+                await self._send_words(len(self.text.split()))
+                await self.write_event(TranscriptStop().event())
+            await self.write_event(Transcript(text=self.text).event())
+        return True
+
+
+class StandinIntent(AsyncEventHandler):
+    def __init__(self, reader, writer, delay: float = 0.0, reply: Optional[str] = None):
+        super().__init__(reader, writer)
+        self.delay = delay
+        self.reply = reply  # Fixed answer instead of echoing the transcript
+
+    async def handle_event(self, event: Event) -> bool:
+        if Transcript.is_type(event.type):
+            await asyncio.sleep(self.delay)
+            text = Transcript.from_event(event).text
+            reply = self.reply if self.reply is not None else f"Done: {text}"
+            await self.write_event(Handled(text=reply).event())
+        return True
+
+
+class StandinTTS(AsyncEventHandler):
+    def __init__(self, reader, writer, delay: float = 0.0, chunks: int = 5, rate: int = 22050):
+        super().__init__(reader, writer)
+        self.delay = delay
+        self.chunks = chunks
+        self.rate = rate
+
+    async def handle_event(self, event: Event) -> bool:
+        if Synthesize.is_type(event.type):
+            await asyncio.sleep(self.delay)
+            await self.write_event(AudioStart(rate=self.rate, width=2, channels=1).event())
+            for _ in range(self.chunks):
+                await self.write_event(
+                    AudioChunk(rate=self.rate, width=2, channels=1, audio=bytes(2048)).event()
+                )
+            await self.write_event(AudioStop().event())
+        return True
+
+
+async def start_standin(handler_cls, **kwargs) -> Tuple[AsyncServer, str]:
+    """Start a stand-in service on an ephemeral port. Returns (server, uri)."""
+    server = AsyncServer.from_uri("tcp://127.0.0.1:0")
+    await server.start(partial(handler_cls, **kwargs))
+    port = server._server.sockets[0].getsockname()[1]
+    return server, f"tcp://127.0.0.1:{port}"